@@ -0,0 +1,101 @@
+"""
+Offline accuracy/throughput report for the local transaction classifier.
+
+Usage:
+    python benchmarks/classifier_report.py [holdout_fraction]
+
+Trains on already-classified rows from the transactions table (connection
+settings from .env), evaluates on a holdout of whole merchants (so no merchant
+is in both train and test) and reports accuracy, coverage at
+LOCAL_CLASSIFIER_MIN_CONFIDENCE and LOCAL_CLASSIFIER_MIN_SIMILARITY, the
+per-class similarity floors and rows/sec.
+"""
+
+import os
+import random
+import sys
+import time
+from collections import Counter
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import psycopg  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+from config import get_settings  # noqa: E402
+from local_classifier import LocalClassifier, SIMILARITY_PERCENTILE  # noqa: E402
+from merchants import normalise_merchant  # noqa: E402
+
+
+def load_rows() -> list[tuple[str, tuple]]:
+    s = get_settings()
+    conninfo = f"host={s.POSTGRES_HOST} port={s.POSTGRES_PORT} dbname={s.POSTGRES_DB} user={s.POSTGRES_USER} password={s.POSTGRES_PASSWORD}"
+
+    with psycopg.connect(conninfo) as conn:
+        rows = conn.execute("""
+            SELECT transaction_details, category, is_tax_deductible, deductible_portion
+            FROM transactions
+            WHERE category IS NOT NULL AND category <> 'Unknown';
+        """).fetchall()
+
+    return [
+        (details or "", (category, bool(deductible), Decimal(portion or 0).quantize(Decimal("0.01"))))
+        for details, category, deductible, portion in rows
+    ]
+
+
+def main(holdout: float) -> None:
+    load_dotenv()
+    s = get_settings()
+
+    rows = load_rows()
+    if len(rows) < 10:
+        sys.exit(f"only {len(rows)} classified rows, nothing to evaluate")
+
+    # hold out whole merchants, otherwise test rows are near-copies of training rows
+    merchants = sorted({normalise_merchant(d) for d, _ in rows})
+    random.Random(0).shuffle(merchants)
+    held_out = set(merchants[:int(len(merchants) * holdout)])
+    train = [row for row in rows if normalise_merchant(row[0]) not in held_out]
+    test = [row for row in rows if normalise_merchant(row[0]) in held_out]
+    if not train or not test:
+        sys.exit(f"{len(merchants)} merchants is too few to split")
+
+    started = time.perf_counter()
+    model = LocalClassifier.fit(
+        [d for d, _ in train], [l for _, l in train], s.LOCAL_CLASSIFIER_MIN_EXAMPLES, s.LOCAL_CLASSIFIER_MIN_SIMILARITY
+    )
+    fit_secs = time.perf_counter() - started
+
+    started = time.perf_counter()
+    predictions = model.predict([d for d, _ in test])
+    predict_secs = time.perf_counter() - started
+
+    correct = [p == label for (p, _), (_, label) in zip(predictions, test)]
+    confident = [
+        ok for ok, (_, confidence) in zip(correct, predictions)
+        if confidence >= s.LOCAL_CLASSIFIER_MIN_CONFIDENCE
+    ]
+
+    print(f"train rows: {len(train)}  test rows: {len(test)}  held-out merchants: {len(held_out)}  classes: {len(model.labels)}")
+    print(f"fit: {fit_secs:.2f}s  predict: {len(test) / predict_secs:,.0f} rows/sec")
+    print(f"accuracy (all): {sum(correct) / len(test):.3f}")
+    print(
+        f"coverage @ confidence {s.LOCAL_CLASSIFIER_MIN_CONFIDENCE}, similarity floor max({s.LOCAL_CLASSIFIER_MIN_SIMILARITY}, "
+        f"p{SIMILARITY_PERCENTILE} of class): {len(confident) / len(test):.3f}  "
+        f"accuracy: {sum(confident) / max(len(confident), 1):.3f}"
+    )
+
+    print("similarity floors:")
+    for label, floor in zip(model.labels, model.floors):
+        print(f"  {str(label[0]):<22} deductible={label[1]!s:<5} portion={label[2]}  {floor:.3f}")
+
+    totals = Counter(label[0] for _, label in test)
+    hits = Counter(label[0] for ok, (_, label) in zip(correct, test) if ok)
+    print("per category:")
+    for category, n in totals.most_common():
+        print(f"  {category:<22} {hits[category] / n:.3f}  ({n})")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.2)
@@ -0,0 +1,56 @@
+"""
+Compares full and fast PDF extraction on a folder of statements.
+
+Usage:
+    python benchmarks/extract_pdf.py <folder_with_pdfs>
+
+Reports pages/sec for each mode and which pages produce different output.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from tools.extract_text import _iter_pdf_pages, _format_page  # noqa: E402
+
+
+def run(paths: list[str], fast: bool) -> tuple[dict, float]:
+    pages = {}
+    started = time.perf_counter()
+
+    for path in paths:
+        for page in _iter_pdf_pages(path, fast=fast):
+            pages[(path, page["page_number"])] = _format_page(page)
+
+    return pages, time.perf_counter() - started
+
+
+def main(folder: str) -> None:
+    paths = [
+        os.path.join(folder, name)
+        for name in sorted(os.listdir(folder))
+        if name.lower().endswith(".pdf")
+    ]
+    if not paths:
+        sys.exit(f"no PDFs found in {folder}")
+
+    full, full_secs = run(paths, fast=False)
+    fast, fast_secs = run(paths, fast=True)
+
+    n = len(full)
+    print(f"files: {len(paths)}  pages: {n}")
+    print(f"full: {full_secs:8.2f}s  {n / full_secs:8.1f} pages/sec")
+    print(f"fast: {fast_secs:8.2f}s  {n / fast_secs:8.1f} pages/sec  ({full_secs / fast_secs:.2f}x)")
+
+    differing = [key for key in full if full[key] != fast.get(key)]
+    print(f"identical pages: {n - len(differing)}/{n}")
+    for path, page_number in differing:
+        print(f"  differs: {os.path.basename(path)} page {page_number}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+    main(sys.argv[1])
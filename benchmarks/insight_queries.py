@@ -0,0 +1,114 @@
+"""
+EXPLAINs typical insight queries on a synthetic dataset, comparing the old
+TEXT-dated, unindexed transactions table with DATE columns and indexes.
+
+Usage:
+    python benchmarks/insight_queries.py [rows]
+
+Builds both variants with the given number of transactions (default 1,000,000)
+in a scratch schema of the database from .env, prints EXPLAIN ANALYZE output
+for each query and drops the schema afterwards.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import psycopg  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+from config import get_settings  # noqa: E402
+
+SCHEMA = "finnie_benchmark"
+CATEGORIES = ["Groceries", "Transport", "Household Bills", "Entertainment", "Subscriptions", "Dining", "Shopping", "Travel"]
+STATEMENTS = 500
+
+# {table} is replaced with the variant's transactions table; {date} casts the TEXT variant
+QUERIES = {
+    "groceries in a month": """
+        SELECT SUM(amount) FROM {table}
+        WHERE category = 'Groceries'
+            AND {date} >= DATE '2025-04-01' AND {date} < DATE '2025-05-01';
+    """,
+    "monthly spend over a year": """
+        SELECT DATE_TRUNC('month', {date}) AS month, SUM(amount) FROM {table}
+        WHERE amount < 0
+            AND {date} >= DATE '2024-07-01' AND {date} < DATE '2025-07-01'
+        GROUP BY 1 ORDER BY 1;
+    """,
+    "five biggest outflows this year": """
+        SELECT transaction_details, amount FROM {table}
+        WHERE amount < 0
+            AND {date} >= DATE '2025-01-01' AND {date} < DATE '2026-01-01'
+        ORDER BY amount ASC LIMIT 5;
+    """,
+    "one statement's transactions": """
+        SELECT t.transaction_date, t.transaction_details, t.amount
+        FROM {table} t JOIN statements s ON s.id = t.statement_id
+        WHERE s.id = 42;
+    """,
+}
+
+
+def build(cur: psycopg.Cursor, n: int) -> None:
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path = {SCHEMA};")
+
+    cur.execute("CREATE TABLE statements (id SERIAL PRIMARY KEY, account_name TEXT);")
+    cur.execute("INSERT INTO statements (account_name) SELECT 'account ' || mod(g, 5) FROM generate_series(1, %s) g;", (STATEMENTS,))
+
+    for table, date_type in (("text_transactions", "TEXT"), ("typed_transactions", "DATE")):
+        cur.execute(f"""
+            CREATE TABLE {table} (
+                id SERIAL PRIMARY KEY,
+                statement_id INTEGER NOT NULL REFERENCES statements(id),
+                transaction_date {date_type},
+                transaction_details TEXT,
+                amount NUMERIC(15, 2),
+                category TEXT
+            );
+        """)
+        cur.execute(f"""
+            INSERT INTO {table} (statement_id, transaction_date, transaction_details, amount, category)
+            SELECT
+                1 + mod(g, {STATEMENTS}),
+                (DATE '2023-01-01' + mod(g, 1095))::{date_type},
+                'MERCHANT ' || mod(g, 5000),
+                CASE WHEN mod(g, 10) = 0 THEN mod(g, 5000)::numeric ELSE -(mod(g, 20000) / 100.0) END,
+                (%s::text[])[1 + mod(g, {len(CATEGORIES)})]
+            FROM generate_series(1, %s) g;
+        """, (CATEGORIES, n))
+
+    cur.execute("CREATE INDEX ON typed_transactions (transaction_date);")
+    cur.execute("CREATE INDEX ON typed_transactions (category, transaction_date);")
+    cur.execute("CREATE INDEX ON typed_transactions (statement_id);")
+    cur.execute("ANALYZE;")
+
+
+def main(n: int) -> None:
+    load_dotenv()
+    s = get_settings()
+    conninfo = f"host={s.POSTGRES_HOST} port={s.POSTGRES_PORT} dbname={s.POSTGRES_DB} user={s.POSTGRES_USER} password={s.POSTGRES_PASSWORD}"
+
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        with conn.cursor() as cur:
+            started = time.perf_counter()
+            build(cur, n)
+            print(f"built {n:,} rows per variant in {time.perf_counter() - started:.1f}s\n")
+
+            try:
+                for name, query in QUERIES.items():
+                    for table, date in (("text_transactions", "transaction_date::date"), ("typed_transactions", "transaction_date")):
+                        sql = query.format(table=table, date=date)
+                        cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql)
+                        plan = [row[0] for row in cur.fetchall()]
+
+                        print(f"=== {name} [{table}] ===")
+                        print("\n".join(plan))
+                        print()
+            finally:
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
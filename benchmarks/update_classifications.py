@@ -0,0 +1,93 @@
+"""
+Compares per-row UPDATE with the set-based apply_classifications for saving
+transaction classifications.
+
+Usage:
+    python benchmarks/update_classifications.py [rows]
+
+Loads a synthetic statement with the given number of transactions (default
+10000) into the database from .env, classifies them with both methods and
+reports rows/sec. Everything is rolled back, so the database is left unchanged.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import psycopg  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+from config import get_settings  # noqa: E402
+from tools.update_transaction_classification import apply_classifications  # noqa: E402
+
+CATEGORIES = ["Groceries", "Transport", "Dining", "Shopping", "Utilities"]
+
+
+async def load_transactions(cur: psycopg.AsyncCursor, n: int) -> list[int]:
+    await cur.execute("""
+        INSERT INTO statements (account_holder, account_name, start_date, end_date)
+        VALUES ('benchmark', 'benchmark', '2024-01-01', '2024-12-31')
+        RETURNING id;
+    """)
+    statement_id = (await cur.fetchone())[0]
+
+    async with cur.copy("COPY transactions (statement_id, transaction_date, transaction_details, amount) FROM STDIN") as copy:
+        for i in range(n):
+            await copy.write_row((statement_id, "2024-01-01", f"BENCHMARK MERCHANT {i % 500}", -1))
+
+    await cur.execute("SELECT id FROM transactions WHERE statement_id = %s ORDER BY id;", (statement_id,))
+    return [row[0] for row in await cur.fetchall()]
+
+
+def results_for(ids: list[int], offset: int) -> list[dict]:
+    return [
+        {
+            "transaction_id": tx_id,
+            "classification": CATEGORIES[(i + offset) % len(CATEGORIES)],
+            "is_tax_deductible": i % 7 == 0,
+            "deductible_portion": Decimal("0.50") if i % 7 == 0 else Decimal("0"),
+        }
+        for i, tx_id in enumerate(ids)
+    ]
+
+
+async def per_row(conn: psycopg.AsyncConnection, results: list[dict]) -> None:
+    async with conn.cursor() as cur:
+        for item in results:
+            await cur.execute("""
+                UPDATE transactions
+                SET category = %s, is_tax_deductible = %s, deductible_portion = %s, classifier_version = %s
+                WHERE id = %s;
+            """, (item["classification"], item["is_tax_deductible"], item["deductible_portion"], "benchmark", item["transaction_id"]))
+
+
+async def set_based(conn: psycopg.AsyncConnection, results: list[dict]) -> None:
+    await apply_classifications(conn, results, "benchmark")
+
+
+async def main(n: int) -> None:
+    load_dotenv()
+    s = get_settings()
+    conninfo = f"host={s.POSTGRES_HOST} port={s.POSTGRES_PORT} dbname={s.POSTGRES_DB} user={s.POSTGRES_USER} password={s.POSTGRES_PASSWORD}"
+
+    async with await psycopg.AsyncConnection.connect(conninfo) as conn:
+        async with conn.cursor() as cur:
+            ids = await load_transactions(cur, n)
+
+        for offset, (name, update) in enumerate((("per-row UPDATE", per_row), ("set-based UPDATE", set_based))):
+            results = results_for(ids, offset)
+
+            started = time.perf_counter()
+            await update(conn, results)
+            secs = time.perf_counter() - started
+
+            print(f"{name:<17} {n} rows in {secs:.3f}s  ({n / secs:,.0f} rows/sec)")
+
+        await conn.rollback()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
@@ -0,0 +1,109 @@
+"""
+Measures how fast statement transactions are written, comparing the old
+per-row INSERT with the code that ships in tools/write_statements.py.
+
+Usage:
+    python benchmarks/write_transactions.py [rows]
+
+Writes a synthetic statement with the given number of transactions (default
+2000) to the database from .env and reports rows/sec for:
+    - per-row INSERT (the original implementation)
+    - _copy_transactions (COPY into staging + INSERT ... ON CONFLICT)
+    - _write_statement (statement upsert + the above + monthly totals refresh)
+    - _write_statement again on the same statement (the idempotent re-run)
+Everything is rolled back, so the database is left unchanged.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import psycopg  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+from config import get_settings  # noqa: E402
+from tools.write_statements import _copy_transactions, _write_statement  # noqa: E402
+
+
+def synthetic_statement(n: int, account_name: str) -> dict:
+    start = date(2024, 1, 1)
+    return {
+        "account_holder": "benchmark",
+        "account_name": account_name,
+        "start_date": "2024-01-01",
+        "end_date": "2024-12-31",
+        "opening_balance": 0,
+        "closing_balance": 0,
+        "credit_limit": 0,
+        "interest_charged": 0,
+        "transactions": [
+            {
+                "transaction_date": (start + timedelta(days=i % 365)).isoformat(),
+                "transaction_details": f"BENCHMARK MERCHANT {i % 500} SYDNEY",
+                "amount": -round(1 + (i % 9973) / 100, 2),
+            }
+            for i in range(n)
+        ],
+    }
+
+
+async def insert_statement(cur: psycopg.AsyncCursor, statement: dict) -> int:
+    await cur.execute("""
+        INSERT INTO statements (account_holder, account_name, start_date, end_date)
+        VALUES (%s, %s, %s, %s)
+        RETURNING id;
+    """, (statement["account_holder"], statement["account_name"], statement["start_date"], statement["end_date"]))
+    return (await cur.fetchone())[0]
+
+
+async def per_row(conn: psycopg.AsyncConnection, cur: psycopg.AsyncCursor, statement: dict) -> None:
+    statement_id = await insert_statement(cur, statement)
+    for tx in statement["transactions"]:
+        await cur.execute("""
+            INSERT INTO transactions (statement_id, transaction_date, transaction_details, amount)
+            VALUES (%s, %s, %s, %s);
+        """, (statement_id, tx["transaction_date"], tx["transaction_details"], tx["amount"]))
+
+
+async def copy_only(conn: psycopg.AsyncConnection, cur: psycopg.AsyncCursor, statement: dict) -> None:
+    statement_id = await insert_statement(cur, statement)
+    await _copy_transactions(cur, statement_id, statement)
+
+
+async def write_statement(conn: psycopg.AsyncConnection, cur: psycopg.AsyncCursor, statement: dict) -> None:
+    await _write_statement(json.dumps(statement), conn, cur)
+
+
+async def main(n: int) -> None:
+    load_dotenv()
+    s = get_settings()
+    conninfo = f"host={s.POSTGRES_HOST} port={s.POSTGRES_PORT} dbname={s.POSTGRES_DB} user={s.POSTGRES_USER} password={s.POSTGRES_PASSWORD}"
+
+    runs = [
+        ("per-row INSERT", per_row, "benchmark per-row"),
+        ("_copy_transactions", copy_only, "benchmark copy"),
+        ("_write_statement", write_statement, "benchmark write"),
+        ("_write_statement re-run", write_statement, "benchmark write"),
+    ]
+
+    async with await psycopg.AsyncConnection.connect(conninfo) as conn:
+        async with conn.cursor() as cur:
+            for name, write, account_name in runs:
+                # each account gets its own fingerprints, so runs don't dedupe against each other
+                statement = synthetic_statement(n, account_name)
+
+                started = time.perf_counter()
+                await write(conn, cur, statement)
+                secs = time.perf_counter() - started
+
+                print(f"{name:<24} {n} rows in {secs:.3f}s  ({n / secs:,.0f} rows/sec)")
+
+        await conn.rollback()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
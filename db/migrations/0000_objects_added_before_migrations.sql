@@ -0,0 +1,32 @@
+-- Tables and columns that were added to schema.sql before migrations existed.
+-- A database created from an older schema.sql lacks them, and later
+-- migrations (e.g. 0003, 0005) depend on them.
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS classifier_version TEXT;
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS fingerprint TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS transactions_fingerprint_idx ON transactions (fingerprint);
+
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    file_hash TEXT PRIMARY KEY,
+    file_name TEXT,
+    file_size BIGINT,
+    file_mtime TIMESTAMP WITH TIME ZONE,
+    statement_id INTEGER REFERENCES statements(id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS merchant_classifications (
+    merchant_key TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    is_tax_deductible BOOLEAN DEFAULT FALSE,
+    deductible_portion NUMERIC(5,2) DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS merchant_web_context (
+    merchant_key TEXT PRIMARY KEY,
+    context TEXT NOT NULL,
+    fetched_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
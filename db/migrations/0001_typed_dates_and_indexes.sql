@@ -0,0 +1,14 @@
+-- Store statement and transaction dates as DATE so range filters and
+-- DATE_TRUNC don't cast every row, and index the columns insight queries
+-- filter, group and join on.
+
+ALTER TABLE statements
+    ALTER COLUMN start_date TYPE DATE USING NULLIF(start_date::text, '')::date,
+    ALTER COLUMN end_date TYPE DATE USING NULLIF(end_date::text, '')::date;
+
+ALTER TABLE transactions
+    ALTER COLUMN transaction_date TYPE DATE USING NULLIF(transaction_date::text, '')::date;
+
+CREATE INDEX IF NOT EXISTS transactions_transaction_date_idx ON transactions (transaction_date);
+CREATE INDEX IF NOT EXISTS transactions_category_transaction_date_idx ON transactions (category, transaction_date);
+CREATE INDEX IF NOT EXISTS transactions_statement_id_idx ON transactions (statement_id);
@@ -0,0 +1,34 @@
+-- Month x account x category rollup of transactions, kept current by the
+-- statement write and classification update paths (see monthly_totals.py).
+
+CREATE TABLE IF NOT EXISTS monthly_category_totals (
+    month DATE NOT NULL,
+    account_holder TEXT NOT NULL,
+    account_name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    total_outflow NUMERIC(15, 2) NOT NULL DEFAULT 0,
+    total_inflow NUMERIC(15, 2) NOT NULL DEFAULT 0,
+    deductible_total NUMERIC(15, 2) NOT NULL DEFAULT 0,
+    txn_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, account_holder, account_name, category)
+);
+
+CREATE INDEX IF NOT EXISTS monthly_category_totals_category_month_idx ON monthly_category_totals (category, month);
+
+TRUNCATE monthly_category_totals;
+
+INSERT INTO monthly_category_totals
+    (month, account_holder, account_name, category, total_outflow, total_inflow, deductible_total, txn_count)
+SELECT
+    DATE_TRUNC('month', t.transaction_date)::date,
+    COALESCE(s.account_holder, ''),
+    COALESCE(s.account_name, ''),
+    COALESCE(t.category, 'Unclassified'),
+    COALESCE(SUM(-t.amount) FILTER (WHERE t.amount < 0), 0),
+    COALESCE(SUM(t.amount) FILTER (WHERE t.amount > 0), 0),
+    COALESCE(SUM(-t.amount * t.deductible_portion) FILTER (WHERE t.is_tax_deductible AND t.amount < 0), 0),
+    COUNT(*)
+FROM transactions t
+JOIN statements s ON s.id = t.statement_id
+WHERE t.transaction_date IS NOT NULL
+GROUP BY 1, 2, 3, 4;
@@ -0,0 +1,9 @@
+-- Merchant keys used to be cut at the first number, so every direct debit,
+-- BPAY or transfer shared a payment-type key such as "direct debit". Drop
+-- those keys; merchants.normalise_merchant now keeps the payee.
+
+DELETE FROM merchant_classifications
+WHERE merchant_key ~* '^(direct (debit|credit)|bpay|((fast|osko) )?transfer (to|from)|osko (payment|deposit)|payment (to|from)|atm withdrawal|cash withdrawal|withdrawal|deposit)$';
+
+DELETE FROM merchant_web_context
+WHERE merchant_key ~* '^(direct (debit|credit)|bpay|((fast|osko) )?transfer (to|from)|osko (payment|deposit)|payment (to|from)|atm withdrawal|cash withdrawal|withdrawal|deposit)$';
@@ -0,0 +1,4 @@
+-- Merchant cache entries only apply to the classifier version that produced
+-- them; entries from before this column existed are never matched again.
+
+ALTER TABLE merchant_classifications ADD COLUMN IF NOT EXISTS classifier_version TEXT;
@@ -0,0 +1,68 @@
+-- Rows loaded before transactions.fingerprint existed have no fingerprint, so
+-- re-writing their statements inserted every transaction again. Compute the
+-- fingerprint for them with the same formula as
+-- write_statements.transaction_fingerprints:
+--   sha256(holder, account, date, details (whitespace collapsed), amount, ordinal)
+-- joined by U+001F, where ordinal numbers identical transactions of an account by id.
+
+CREATE TEMP TABLE fingerprint_backfill ON COMMIT DROP AS
+WITH content AS (
+    SELECT
+        t.id,
+        t.fingerprint,
+        COALESCE(s.account_holder, '') AS account_holder,
+        COALESCE(s.account_name, '') AS account_name,
+        to_char(t.transaction_date, 'YYYY-MM-DD') AS transaction_date,
+        btrim(regexp_replace(COALESCE(t.transaction_details, ''), '\s+', ' ', 'g')) AS details,
+        (t.amount::numeric(15, 2) + 0)::text AS amount
+    FROM transactions t
+    JOIN statements s ON s.id = t.statement_id
+),
+numbered AS (
+    SELECT
+        *,
+        row_number() OVER (
+            PARTITION BY account_holder, account_name, transaction_date, details, amount
+            ORDER BY id
+        ) - 1 AS ordinal
+    FROM content
+)
+SELECT
+    id,
+    encode(sha256(convert_to(
+        concat_ws(chr(31), account_holder, account_name, transaction_date, details, amount, ordinal::text),
+        'UTF8'
+    )), 'hex') AS fingerprint
+FROM numbered
+WHERE fingerprint IS NULL;
+
+-- rows written after the upgrade but before this backfill duplicate an older
+-- row that had no fingerprint to conflict with; keep the older row
+DELETE FROM transactions t
+USING fingerprint_backfill b
+WHERE t.fingerprint = b.fingerprint
+    AND t.id <> b.id;
+
+UPDATE transactions t
+SET fingerprint = b.fingerprint
+FROM fingerprint_backfill b
+WHERE t.id = b.id;
+
+-- duplicates removed above were counted in the rollup
+TRUNCATE monthly_category_totals;
+
+INSERT INTO monthly_category_totals
+    (month, account_holder, account_name, category, total_outflow, total_inflow, deductible_total, txn_count)
+SELECT
+    DATE_TRUNC('month', t.transaction_date)::date,
+    COALESCE(s.account_holder, ''),
+    COALESCE(s.account_name, ''),
+    COALESCE(t.category, 'Unclassified'),
+    COALESCE(SUM(-t.amount) FILTER (WHERE t.amount < 0), 0),
+    COALESCE(SUM(t.amount) FILTER (WHERE t.amount > 0), 0),
+    COALESCE(SUM(-t.amount * t.deductible_portion) FILTER (WHERE t.is_tax_deductible AND t.amount < 0), 0),
+    COUNT(*)
+FROM transactions t
+JOIN statements s ON s.id = t.statement_id
+WHERE t.transaction_date IS NOT NULL
+GROUP BY 1, 2, 3, 4;
@@ -5,8 +5,8 @@ CREATE TABLE IF NOT EXISTS statements (
     id SERIAL PRIMARY KEY,
     account_holder TEXT,
     account_name TEXT,
-    start_date TEXT,
-    end_date TEXT,
+    start_date DATE,
+    end_date DATE,
     opening_balance NUMERIC(15, 2),
     closing_balance NUMERIC(15, 2),
     credit_limit NUMERIC(15, 2),
@@ -21,12 +21,76 @@ CREATE TABLE IF NOT EXISTS statements (
 CREATE TABLE IF NOT EXISTS transactions (
     id SERIAL PRIMARY KEY,
     statement_id INTEGER NOT NULL REFERENCES statements(id) ON DELETE CASCADE,
-    transaction_date TEXT,
+    transaction_date DATE,
     transaction_details TEXT,
     amount NUMERIC(15, 2),
     category TEXT,
     is_tax_deductible BOOLEAN DEFAULT FALSE,
     deductible_portion NUMERIC(5,2) DEFAULT 0,
+    classifier_version TEXT,
+    fingerprint TEXT,
     created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS classifier_version TEXT;
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS fingerprint TEXT;
+
+-- account + date + details + amount + ordinal, see write_statements.transaction_fingerprints
+CREATE UNIQUE INDEX IF NOT EXISTS transactions_fingerprint_idx ON transactions (fingerprint);
+CREATE INDEX IF NOT EXISTS transactions_transaction_date_idx ON transactions (transaction_date);
+CREATE INDEX IF NOT EXISTS transactions_category_transaction_date_idx ON transactions (category, transaction_date);
+CREATE INDEX IF NOT EXISTS transactions_statement_id_idx ON transactions (statement_id);
+
+-- =========================
+-- ingest manifest table
+-- =========================
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    file_hash TEXT PRIMARY KEY,
+    file_name TEXT,
+    file_size BIGINT,
+    file_mtime TIMESTAMP WITH TIME ZONE,
+    statement_id INTEGER REFERENCES statements(id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- =========================
+-- merchant classifications table
+-- =========================
+CREATE TABLE IF NOT EXISTS merchant_classifications (
+    merchant_key TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    is_tax_deductible BOOLEAN DEFAULT FALSE,
+    deductible_portion NUMERIC(5,2) DEFAULT 0,
+    classifier_version TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- =========================
+-- merchant web context table
+-- =========================
+CREATE TABLE IF NOT EXISTS merchant_web_context (
+    merchant_key TEXT PRIMARY KEY,
+    context TEXT NOT NULL,
+    fetched_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+
+-- =========================
+-- monthly category totals table
+-- =========================
+-- maintained by monthly_totals.refresh_monthly_totals when statements are
+-- written and transactions are classified
+CREATE TABLE IF NOT EXISTS monthly_category_totals (
+    month DATE NOT NULL,
+    account_holder TEXT NOT NULL,
+    account_name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    total_outflow NUMERIC(15, 2) NOT NULL DEFAULT 0,
+    total_inflow NUMERIC(15, 2) NOT NULL DEFAULT 0,
+    deductible_total NUMERIC(15, 2) NOT NULL DEFAULT 0,
+    txn_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, account_holder, account_name, category)
+);
+
+CREATE INDEX IF NOT EXISTS monthly_category_totals_category_month_idx ON monthly_category_totals (category, month);
@@ -45,8 +45,8 @@ async def scribe(state: AgentState, config: RunnableConfig):
             5. parse each plain text version so that you can get a JSON version.
             6. save each statement JSON to database for future use.
             7. wait for each statement to finish parsing and saving to database before proceeding further
-            8. once all statements are parsed and saved, get all transactions from the database for each statement and classify them using classify-transactions tool.
-            9. update the transaction classification in database.
+            8. once all statements are parsed and saved, get the transactions that still need classifying from the database (read-transactions with only_unclassified=true and stream=true) and classify them using classify-transactions tool.
+            9. classify-transactions saves classifications to the database as it goes; do not call update-transaction-classification afterwards. if some transactions failed, run step 8 again to retry only those.
         
         **Progress reporting**
         - Do **not** reveal private reasoning or chain of thought.
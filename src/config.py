@@ -21,6 +21,47 @@ class Settings(BaseSettings):
     TAVILY_API_KEY: str = ""
     LANGSMITH_TRACING: str = ""
     LANGSMITH_API_KEY: str = ""
+
+    EXTRACT_MAX_WORKERS: int | None = None
+    PDF_FAST_EXTRACTION: bool = False
+    EXTRACTION_CACHE_DIR: str = ".cache/extraction"
+    EXTRACTION_CACHE_MAX_BYTES: int = 256_000_000
+    PARSE_CACHE_PATH: str = ".cache/parse_cache.sqlite3"
+    # account name for CSV exports that don't include one, by file name glob,
+    # e.g. {"CSVData*.csv": "Smart Access"}
+    CSV_ACCOUNT_NAMES: dict[str, str] = {}
+
+    PARSER_MAX_CONCURRENCY: int = 4
+    PARSER_REQUESTS_PER_MINUTE: int = 60
+    PARSER_TOKENS_PER_MINUTE: int = 200_000
+    # statements written at once, each on its own pool connection (pool max_size is 10)
+    WRITER_MAX_CONCURRENCY: int = 4
+
+    # transactions per page when read-transactions streams in keyset-paged chunks
+    READ_CHUNK_SIZE: int = 2000
+    CLASSIFIER_MAX_CONCURRENCY: int = 4
+    CLASSIFIER_REQUESTS_PER_MINUTE: int = 60
+    CLASSIFIER_TOKENS_PER_MINUTE: int = 200_000
+    CLASSIFIER_MIN_BATCH_SIZE: int = 5
+    CLASSIFIER_MAX_BATCH_SIZE: int = 150
+    CLASSIFIER_TARGET_BATCH_SECONDS: float = 30.0
+    CLASSIFIER_MAX_OUTPUT_TOKENS: int = 16_000
+    WEB_CONTEXT_TTL_DAYS: int = 90
+    WEB_CONTEXT_MAX_CONCURRENCY: int = 4
+    LOCAL_CLASSIFIER_ENABLED: bool = True
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE: float = 0.9
+    LOCAL_CLASSIFIER_MIN_EXAMPLES: int = 3
+    # minimum cosine similarity to a class centroid before a prediction counts as confident
+    LOCAL_CLASSIFIER_MIN_SIMILARITY: float = 0.2
+    # most recent classified transactions the local classifier trains on
+    LOCAL_CLASSIFIER_MAX_TRAINING_ROWS: int = 50000
+
+    # input tokens per parse chunk, sized so the structured output stays under each model's output limit
+    PARSER_CHUNK_TOKEN_BUDGET: int = 4000
+    PARSER_CHUNK_TOKEN_BUDGETS: dict[str, int] = {
+        "gpt-4o": 6000,
+        "gpt-4.1": 12000,
+    }
     
 
     model_config = SettingsConfigDict(
@@ -4,6 +4,7 @@ from config import get_settings
 from functools import lru_cache
 from psycopg_pool import AsyncConnectionPool
 from search_providers import TavilySearchClient, SerperSearchClient, SearchProvider
+from rate_limiter import RateLimiter
 
 @lru_cache(maxsize=1)
 def get_llm(
@@ -40,6 +41,26 @@ def get_text_parser_llm() -> ChatOpenAI:
         api_key=SecretStr(s.OPENAI_API_KEY) if s.OPENAI_API_KEY is not None else None,
     )
 
+@lru_cache(maxsize=1)
+def get_parser_rate_limiter() -> RateLimiter:
+    s = get_settings()
+
+    return RateLimiter(
+        "parser",
+        requests_per_minute=s.PARSER_REQUESTS_PER_MINUTE,
+        tokens_per_minute=s.PARSER_TOKENS_PER_MINUTE,
+    )
+
+@lru_cache(maxsize=1)
+def get_classifier_rate_limiter() -> RateLimiter:
+    s = get_settings()
+
+    return RateLimiter(
+        "classifier",
+        requests_per_minute=s.CLASSIFIER_REQUESTS_PER_MINUTE,
+        tokens_per_minute=s.CLASSIFIER_TOKENS_PER_MINUTE,
+    )
+
 @lru_cache(maxsize=1)
 def get_transaction_classifier_llm() -> ChatOpenAI:
     s = get_settings()
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+from config import get_settings
+from logger import log
+
+# eviction frees space down to this fraction of the limit, so a full cache is
+# rescanned once per that much new data rather than on every put
+EVICTION_TARGET = 0.9
+# get_cached/put_cached run in asyncio.to_thread workers
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0}
+# bytes in the cache directory: scanned on the first put, then kept up to date
+# by put_cached and re-synced whenever eviction rescans the directory
+_cache_bytes: int | None = None
+
+def file_digest(path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's content.
+    """
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+
+    return h.hexdigest()
+
+def cache_key(digest: str, extractor: str) -> str:
+    """
+    Builds the cache key for a file digest and an extractor version tag
+    (e.g. "pdf-v1"), so bumping the extractor version invalidates old entries.
+    """
+
+    return hashlib.sha256(f"{extractor}:{digest}".encode("utf-8")).hexdigest()
+
+def _cache_dir() -> Path:
+    path = Path(get_settings().EXTRACTION_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def get_cached(key: str) -> Any | None:
+    """
+    Returns the cached extraction result for a key, or None on a miss.
+    """
+
+    path = _cache_dir() / f"{key}.json"
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            value = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        with _LOCK:
+            _STATS["misses"] += 1
+        return None
+
+    # refresh mtime so eviction drops the least recently used entries first
+    os.utime(path)
+    with _LOCK:
+        _STATS["hits"] += 1
+    return value
+
+def put_cached(key: str, value: Any) -> None:
+    """
+    Stores an extraction result and evicts the least recently used entries
+    once the cache grows past EXTRACTION_CACHE_MAX_BYTES. The directory is only
+    scanned on the first put and when eviction is due, not on every put.
+    """
+
+    global _cache_bytes
+
+    cache_dir = _cache_dir()
+    path = cache_dir / f"{key}.json"
+    tmp_path = path.with_suffix(".tmp")
+
+    try:
+        replaced = path.stat().st_size
+    except FileNotFoundError:
+        replaced = 0
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    written = tmp_path.stat().st_size
+    os.replace(tmp_path, path)
+
+    max_bytes = get_settings().EXTRACTION_CACHE_MAX_BYTES
+    with _LOCK:
+        if _cache_bytes is None:
+            _cache_bytes = _scan(cache_dir)
+        else:
+            _cache_bytes += written - replaced
+
+        if _cache_bytes > max_bytes:
+            _cache_bytes = _evict(cache_dir, max_bytes)
+
+def _scan(cache_dir: Path) -> int:
+    return sum(size for _, size, _ in _entries(cache_dir))
+
+def _entries(cache_dir: Path) -> list[tuple[float, int, Path]]:
+    entries = []
+    for entry in cache_dir.glob("*.json"):
+        try:
+            st = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, entry))
+
+    return entries
+
+def _evict(cache_dir: Path, max_bytes: int) -> int:
+    """
+    Deletes the least recently used entries until the cache fits in
+    EVICTION_TARGET of max_bytes, once it has grown past max_bytes.
+
+    Returns:
+        int: bytes left in the cache
+    """
+
+    entries = _entries(cache_dir)
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return total
+
+    for _, size, entry in sorted(entries):
+        entry.unlink(missing_ok=True)
+        total -= size
+        log.info(f"[extraction_cache] evicted {entry.name}")
+        if total <= max_bytes * EVICTION_TARGET:
+            break
+
+    return total
+
+def log_stats(caller: str) -> None:
+    with _LOCK:
+        hits, misses = _STATS["hits"], _STATS["misses"]
+    log.info(f"[{caller}] extraction cache hits={hits} misses={misses}")
@@ -0,0 +1,110 @@
+import os
+from datetime import datetime, timezone
+from psycopg import AsyncCursor
+from dependencies import get_db_pool
+from logger import log
+
+STAGE_EXTRACTED = "extracted"
+STAGE_PARSED = "parsed"
+STAGE_WRITTEN = "written"
+
+_UPSERT_SQL = """
+    INSERT INTO ingest_manifest
+        (
+            file_hash,
+            file_name,
+            file_size,
+            file_mtime,
+            statement_id,
+            stage
+        )
+    VALUES
+        (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (file_hash) DO UPDATE SET
+        file_name = COALESCE(EXCLUDED.file_name, ingest_manifest.file_name),
+        file_size = COALESCE(EXCLUDED.file_size, ingest_manifest.file_size),
+        file_mtime = COALESCE(EXCLUDED.file_mtime, ingest_manifest.file_mtime),
+        statement_id = COALESCE(EXCLUDED.statement_id, ingest_manifest.statement_id),
+        stage = EXCLUDED.stage,
+        updated_at = CURRENT_TIMESTAMP;
+"""
+
+def file_info(path: str, file_hash: str, file_name: str) -> dict:
+    """
+    Collects the manifest fields describing a file on disk.
+    """
+
+    st = os.stat(path)
+    return {
+        "file_hash": file_hash,
+        "file_name": file_name,
+        "file_size": st.st_size,
+        "file_mtime": datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+    }
+
+def completed_files(outcomes: list[dict]) -> list[str]:
+    """
+    Returns the hashes of files whose every ref succeeded. A file split into
+    several refs (e.g. CSV batches) is only complete once all of them have,
+    even if some of its refs were never passed to this stage.
+
+    Args:
+        outcomes: successful refs as {"ref_id", "file_hash", "file_refs"}, where
+            file_refs is the number of refs the file was split into at extraction
+    """
+
+    done: dict[str, set] = {}
+    expected: dict[str, int] = {}
+    for o in outcomes:
+        if not o.get("file_hash"):
+            continue
+        done.setdefault(o["file_hash"], set()).add(o["ref_id"])
+        expected[o["file_hash"]] = o.get("file_refs") or 1
+
+    return [h for h, refs in done.items() if len(refs) >= expected[h]]
+
+async def get_ingested_hashes(file_hashes: list[str]) -> set[str]:
+    """
+    Returns the subset of file hashes whose statements are already written to the database.
+    """
+
+    if not file_hashes:
+        return set()
+
+    pool = get_db_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT file_hash FROM ingest_manifest WHERE stage = %s AND file_hash = ANY(%s);",
+                (STAGE_WRITTEN, file_hashes),
+            )
+            rows = await cur.fetchall()
+
+    return {row[0] for row in rows}
+
+async def record_files(files: list[dict], stage: str) -> None:
+    """
+    Records (or advances) the pipeline stage of files described by file_info().
+    """
+
+    if not files:
+        return
+
+    pool = get_db_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.executemany(_UPSERT_SQL, [
+                (f["file_hash"], f.get("file_name"), f.get("file_size"), f.get("file_mtime"), None, stage)
+                for f in files
+            ])
+        await conn.commit()
+
+    log.info(f"[ingest_manifest] recorded {len(files)} file(s) at stage '{stage}'")
+
+async def record_stage(cur: AsyncCursor, file_hash: str, stage: str, statement_id: int | None = None) -> None:
+    """
+    Advances a single file's stage using the caller's cursor, so the manifest
+    update commits or rolls back together with the caller's transaction.
+    """
+
+    await cur.execute(_UPSERT_SQL, (file_hash, None, None, None, statement_id, stage))
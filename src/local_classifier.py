@@ -0,0 +1,164 @@
+import asyncio
+import time
+import zlib
+from decimal import Decimal
+from typing import List
+import numpy as np
+from dependencies import get_db_pool
+from merchants import normalise_merchant
+from logger import log
+
+N_FEATURES = 2 ** 12
+NGRAM_SIZES = (2, 3, 4)
+CHUNK_ROWS = 2048
+# softmax temperature over cosine similarities; lower is more decisive
+TEMPERATURE = 0.05
+# a class's similarity floor is this percentile of its own training examples' similarity
+SIMILARITY_PERCENTILE = 10
+
+def _featurise(texts: List[str]) -> np.ndarray:
+    """
+    Hashes character n-grams of each text's normalised merchant key into an
+    L2-normalised vector, so store numbers and locations don't dilute the signal.
+
+    Returns:
+        np.ndarray: (len(texts), N_FEATURES) float32
+    """
+
+    features = np.zeros((len(texts), N_FEATURES), dtype=np.float32)
+
+    for row, text in enumerate(texts):
+        padded = f" {normalise_merchant(text)} "
+        buckets = [
+            zlib.crc32(padded[i:i + n].encode("utf-8")) % N_FEATURES
+            for n in NGRAM_SIZES
+            for i in range(len(padded) - n + 1)
+        ]
+        if buckets:
+            np.add.at(features[row], buckets, 1.0)
+
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    np.divide(features, norms, out=features, where=norms > 0)
+    return features
+
+class LocalClassifier:
+    """
+    Nearest-centroid classifier over hashed character n-grams. Each class is a
+    (category, is_tax_deductible, deductible_portion) combination seen in
+    already-classified transactions.
+
+    Confidence is relative between classes, so each class also has a floor on
+    absolute cosine similarity: the larger of min_similarity and the
+    SIMILARITY_PERCENTILE-th percentile of its training examples' similarity.
+    A description below the floor of its best class gets confidence 0, so an
+    unfamiliar merchant is never auto-labelled just because one class is
+    slightly less dissimilar than the others.
+    """
+
+    def __init__(self, labels: List[tuple], centroids: np.ndarray, floors: np.ndarray):
+        self.labels = labels
+        self.centroids = centroids
+        self.floors = floors
+
+    @classmethod
+    def fit(cls, descriptions: List[str], labels: List[tuple], min_examples: int = 3, min_similarity: float = 0.0) -> "LocalClassifier":
+        """
+        Trains on descriptions and their labels, ignoring classes with fewer than min_examples.
+        """
+
+        counts: dict[tuple, int] = {}
+        for label in labels:
+            counts[label] = counts.get(label, 0) + 1
+
+        classes = sorted((label for label, n in counts.items() if n >= min_examples), key=str)
+        index = {label: i for i, label in enumerate(classes)}
+        centroids = np.zeros((len(classes), N_FEATURES), dtype=np.float32)
+
+        rows = [(d, index[label]) for d, label in zip(descriptions, labels) if label in index]
+        for start in range(0, len(rows), CHUNK_ROWS):
+            chunk = rows[start:start + CHUNK_ROWS]
+            np.add.at(centroids, [i for _, i in chunk], _featurise([d for d, _ in chunk]))
+
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        np.divide(centroids, norms, out=centroids, where=norms > 0)
+
+        # how similar each class's own examples are to it; big, varied classes sit lower
+        similarities = np.zeros(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), CHUNK_ROWS):
+            chunk = rows[start:start + CHUNK_ROWS]
+            features = _featurise([d for d, _ in chunk])
+            similarities[start:start + len(chunk)] = np.einsum("ij,ij->i", features, centroids[[i for _, i in chunk]])
+
+        class_ids = np.array([i for _, i in rows], dtype=np.int64)
+        floors = np.array([
+            max(min_similarity, float(np.percentile(similarities[class_ids == i], SIMILARITY_PERCENTILE)))
+            for i in range(len(classes))
+        ], dtype=np.float32)
+
+        return cls(classes, centroids, floors)
+
+    def predict(self, descriptions: List[str]) -> List[tuple[tuple, float]]:
+        """
+        Returns the most likely label and its confidence (0 to 1) for each description.
+        Confidence is 0 when the description is less similar to the label than the label's floor.
+        """
+
+        if not self.labels:
+            return [((None, False, Decimal("0")), 0.0) for _ in descriptions]
+
+        predictions = []
+        for start in range(0, len(descriptions), CHUNK_ROWS):
+            similarities = _featurise(descriptions[start:start + CHUNK_ROWS]) @ self.centroids.T
+            scores = np.exp((similarities - similarities.max(axis=1, keepdims=True)) / TEMPERATURE)
+            probabilities = scores / scores.sum(axis=1, keepdims=True)
+
+            best = probabilities.argmax(axis=1)
+            predictions.extend(
+                (self.labels[i], float(probabilities[row, i]) if similarities[row, i] >= self.floors[i] else 0.0)
+                for row, i in enumerate(best)
+            )
+
+        return predictions
+
+async def load_training_data(max_rows: int) -> tuple[List[str], List[tuple]]:
+    """
+    Reads the max_rows most recent already-classified transactions as
+    (descriptions, labels), skipping "Unknown", so training time and memory
+    stay bounded however much history has been classified.
+    """
+
+    pool = get_db_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                SELECT
+                    transaction_details,
+                    category,
+                    is_tax_deductible,
+                    deductible_portion
+                FROM transactions
+                WHERE category IS NOT NULL AND category <> 'Unknown'
+                ORDER BY id DESC
+                LIMIT %s;
+            """, (max_rows,))
+            rows = await cur.fetchall()
+
+    descriptions = [row[0] or "" for row in rows]
+    labels = [(row[1], bool(row[2]), Decimal(row[3] or 0).quantize(Decimal("0.01"))) for row in rows]
+    return descriptions, labels
+
+async def train_local_classifier(min_examples: int = 3, min_similarity: float = 0.0, max_rows: int = 50000) -> LocalClassifier:
+    """
+    Trains a LocalClassifier on the max_rows most recent already-classified transactions in the database.
+    """
+
+    descriptions, labels = await load_training_data(max_rows)
+
+    started = time.perf_counter()
+    model = await asyncio.to_thread(LocalClassifier.fit, descriptions, labels, min_examples, min_similarity)
+    log.info(
+        f"[local_classifier] trained on {len(descriptions)} rows, {len(model.labels)} classes "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+    return model
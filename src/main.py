@@ -12,6 +12,7 @@ from agents.supervisor import get_graph
 from config import get_settings
 from logger import log
 from dependencies import get_llm, init_db_pool, close_db_pool
+from migrations import apply_migrations
 from rich.console import Console
 from prompt_toolkit import PromptSession
 from prompt_toolkit.formatted_text import HTML
@@ -43,6 +44,7 @@ async def chat():
 
     try:
         await init_db_pool()
+        await apply_migrations()
         graph = get_graph()
 
         messages: list = []
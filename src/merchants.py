@@ -0,0 +1,153 @@
+import re
+from decimal import Decimal
+from dependencies import get_db_pool
+from logger import log
+
+_PREFIXES = re.compile(
+    r"^(?:(?:eftpos|visa|mastercard|debit card|card)\s+(?:purchase|debit)?\s*|pos\s+|sq\s*\*|sp\s+|paypal\s*\*|pp\s*\*)",
+    re.IGNORECASE,
+)
+_CARD_SUFFIX = re.compile(r"\b(?:card\s*)?(?:x{2,}|\*{2,})\d{2,4}\b|\bcard\s+\d{4}\b", re.IGNORECASE)
+_DATES = re.compile(
+    r"\b\d{1,2}[/-]\d{1,2}(?:[/-]\d{2,4})?\b|\b\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*(?:\s+\d{2,4})?\b|\bvalue date:?.*$",
+    re.IGNORECASE,
+)
+_STORE_NUMBER = re.compile(r"\s#?\d{2,}\b.*$")
+_LOCATIONS = re.compile(
+    r"\b(?:nsw|ns|vic|qld|act|wa|sa|tas|nt|aus|au|sydney|melbourne|brisbane|perth|adelaide|hobart|darwin|canberra)\b",
+    re.IGNORECASE,
+)
+_NON_WORD = re.compile(r"[^a-z0-9&' ]+")
+# bank payment types whose payee follows a reference number, e.g. "BPAY 12345 ORIGIN ENERGY"
+_PAYMENT_TYPE = (
+    r"(?:direct\s+(?:debit|credit)|bpay|(?:fast\s+|osko\s+)?transfer\s+(?:to|from)|osko\s+(?:payment|deposit)"
+    r"|payment\s+(?:to|from)|atm\s+withdrawal|cash\s+withdrawal|withdrawal|deposit)"
+)
+_PAYMENT_PREFIX = re.compile(rf"^{_PAYMENT_TYPE}\b", re.IGNORECASE)
+_GENERIC_KEY = re.compile(rf"^{_PAYMENT_TYPE}(?:\s+(?:ref|reference|no|receipt|online|internet|mobile|banking))*$", re.IGNORECASE)
+_REFERENCE_NUMBER = re.compile(r"(?<!\S)#?[\d-]{2,}(?!\S)")
+
+def normalise_merchant(description: str) -> str:
+    """
+    Reduces a transaction description to a stable merchant key by stripping
+    payment prefixes, card suffixes, dates, store numbers and locations, e.g.
+    "WOOLWORTHS 1234 SYDNEY" -> "woolworths".
+    For bank payments the payee follows a reference number, so only the
+    numbers are dropped: "BPAY 12345 ORIGIN ENERGY" -> "bpay origin energy".
+    Falls back to the lower-cased description if nothing is left.
+    """
+
+    text = _CARD_SUFFIX.sub(" ", description)
+    text = _DATES.sub(" ", text).strip()
+
+    if _PAYMENT_PREFIX.match(text):
+        text = _REFERENCE_NUMBER.sub(" ", text)
+    else:
+        text = _PREFIXES.sub("", text)
+        # card purchases: a store number is followed only by its location
+        text = _STORE_NUMBER.sub("", text)
+
+    text = _LOCATIONS.sub(" ", text)
+    text = _NON_WORD.sub(" ", text.lower())
+    key = " ".join(text.split())
+
+    return key or " ".join(description.lower().split())
+
+def is_generic_merchant(key: str) -> bool:
+    """
+    True if a merchant key is only a payment type with no payee (e.g.
+    "direct debit", "bpay", "transfer to"), so it can't identify a merchant
+    and must not be cached or shared between transactions.
+    """
+
+    return bool(_GENERIC_KEY.match(key))
+
+def merchant_key(description: str) -> str | None:
+    """
+    Returns the merchant key for a description, or None if it only names a
+    payment type.
+    """
+
+    key = normalise_merchant(description)
+    return None if is_generic_merchant(key) else key
+
+async def lookup_merchants(keys: list[str], classifier_version: str) -> dict[str, dict]:
+    """
+    Returns the learned classification for each known merchant key, ignoring
+    entries learned by a different classifier version.
+
+    Returns:
+        dict: {merchant_key: {"classification", "is_tax_deductible", "deductible_portion"}}
+    """
+
+    keys = [key for key in keys if not is_generic_merchant(key)]
+    if not keys:
+        return {}
+
+    pool = get_db_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                SELECT
+                    merchant_key,
+                    category,
+                    is_tax_deductible,
+                    deductible_portion
+                FROM merchant_classifications
+                WHERE merchant_key = ANY(%s)
+                    AND classifier_version = %s;
+            """, (keys, classifier_version))
+            rows = await cur.fetchall()
+
+    return {
+        row[0]: {
+            "classification": row[1],
+            "is_tax_deductible": row[2],
+            "deductible_portion": row[3],
+        }
+        for row in rows
+    }
+
+async def learn_merchants(entries: dict[str, dict], classifier_version: str) -> None:
+    """
+    Records (or refreshes) merchant classifications learned from the LLM.
+    "Unknown" results are not learned so those merchants get another chance,
+    and generic payment-type keys are never learned.
+
+    Args:
+        entries: {merchant_key: {"classification", "is_tax_deductible", "deductible_portion"}}
+        classifier_version: version that produced the classifications
+    """
+
+    rows = [
+        (key, e["classification"], e["is_tax_deductible"], Decimal(str(e["deductible_portion"])), classifier_version)
+        for key, e in entries.items()
+        if e["classification"] != "Unknown" and not is_generic_merchant(key)
+    ]
+    if not rows:
+        return
+
+    pool = get_db_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.executemany("""
+                INSERT INTO merchant_classifications
+                    (
+                        merchant_key,
+                        category,
+                        is_tax_deductible,
+                        deductible_portion,
+                        classifier_version
+                    )
+                VALUES
+                    (%s, %s, %s, %s, %s)
+                ON CONFLICT (merchant_key) DO UPDATE SET
+                    category = EXCLUDED.category,
+                    is_tax_deductible = EXCLUDED.is_tax_deductible,
+                    deductible_portion = EXCLUDED.deductible_portion,
+                    classifier_version = EXCLUDED.classifier_version,
+                    updated_at = CURRENT_TIMESTAMP;
+            """, rows)
+        await conn.commit()
+
+    log.info(f"[merchants] learned {len(rows)} merchant classification(s)")
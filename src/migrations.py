@@ -0,0 +1,78 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+from dependencies import get_db_pool, init_db_pool, close_db_pool
+from logger import log
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "db", "migrations")
+# arbitrary key so concurrent runners apply migrations one at a time
+_LOCK_KEY = 72_390_017
+
+def pending_migrations(applied: set[str]) -> list[tuple[str, str]]:
+    """
+    Returns (version, path) for each migration file not yet applied, in order.
+    The version is the file name without .sql, e.g. "0001_typed_dates_and_indexes".
+    """
+
+    return [
+        (name[:-4], os.path.join(MIGRATIONS_DIR, name))
+        for name in sorted(os.listdir(MIGRATIONS_DIR))
+        if name.endswith(".sql") and name[:-4] not in applied
+    ]
+
+async def apply_migrations() -> list[str]:
+    """
+    Applies pending db/migrations/*.sql files in order and records them in
+    schema_migrations. All pending migrations run in one transaction, so a
+    failure leaves the database unchanged.
+
+    Returns:
+        list: versions applied by this call
+
+    Raises exception on failure.
+    """
+
+    pool = get_db_pool()
+    applied_now = []
+
+    async with pool.connection() as conn:
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        await conn.commit()
+
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock(%s);", (_LOCK_KEY,))
+            cur = await conn.execute("SELECT version FROM schema_migrations;")
+            applied = {row[0] for row in await cur.fetchall()}
+
+            for version, path in pending_migrations(applied):
+                with open(path, encoding="utf-8") as f:
+                    sql = f.read()
+
+                log.info(f"[migrations] applying {version}...")
+                await conn.execute(sql)
+                await conn.execute("INSERT INTO schema_migrations (version) VALUES (%s);", (version,))
+
+                applied_now.append(version)
+
+    if applied_now:
+        log.info(f"[migrations] applied {len(applied_now)} migration(s)")
+
+    return applied_now
+
+async def main():
+    load_dotenv()
+    await init_db_pool()
+
+    try:
+        applied = await apply_migrations()
+        print("\n".join(applied) if applied else "database is up to date")
+    finally:
+        await close_db_pool()
+
+if __name__ == "__main__":
+    asyncio.run(main())
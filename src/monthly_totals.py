@@ -0,0 +1,79 @@
+from psycopg import AsyncCursor
+from logger import log
+
+# category used for transactions that haven't been classified yet
+UNCLASSIFIED = "Unclassified"
+
+async def refresh_monthly_totals(cur: AsyncCursor, statement_ids: list[int] | None = None, transaction_ids: list[int] | None = None) -> None:
+    """
+    Recomputes the monthly_category_totals rows for every (month, account)
+    touched by the given statements or transactions, using the caller's cursor
+    so the rollup commits or rolls back together with the change that caused it.
+    Call after the transactions have been written or updated.
+    """
+
+    if not statement_ids and not transaction_ids:
+        return
+
+    await cur.execute("""
+        SELECT DISTINCT
+            DATE_TRUNC('month', t.transaction_date)::date,
+            COALESCE(s.account_holder, ''),
+            COALESCE(s.account_name, '')
+        FROM transactions t
+        JOIN statements s ON s.id = t.statement_id
+        WHERE (t.statement_id = ANY(%s) OR t.id = ANY(%s))
+            AND t.transaction_date IS NOT NULL;
+    """, (statement_ids or [], transaction_ids or []))
+    groups = await cur.fetchall()
+
+    if not groups:
+        return
+
+    # serialise concurrent refreshes of the same account; sorted so lock order is consistent
+    for holder, name in sorted({(g[1], g[2]) for g in groups}):
+        await cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s));", (f"monthly_category_totals:{holder}:{name}",))
+
+    params = ([g[0] for g in groups], [g[1] for g in groups], [g[2] for g in groups])
+
+    await cur.execute("""
+        DELETE FROM monthly_category_totals m
+        USING unnest(%s::date[], %s::text[], %s::text[]) AS g(month, account_holder, account_name)
+        WHERE m.month = g.month
+            AND m.account_holder = g.account_holder
+            AND m.account_name = g.account_name;
+    """, params)
+
+    await cur.execute("""
+        INSERT INTO monthly_category_totals
+            (
+                month,
+                account_holder,
+                account_name,
+                category,
+                total_outflow,
+                total_inflow,
+                deductible_total,
+                txn_count
+            )
+        SELECT
+            g.month,
+            g.account_holder,
+            g.account_name,
+            COALESCE(t.category, %s),
+            COALESCE(SUM(-t.amount) FILTER (WHERE t.amount < 0), 0),
+            COALESCE(SUM(t.amount) FILTER (WHERE t.amount > 0), 0),
+            COALESCE(SUM(-t.amount * t.deductible_portion) FILTER (WHERE t.is_tax_deductible AND t.amount < 0), 0),
+            COUNT(*)
+        FROM unnest(%s::date[], %s::text[], %s::text[]) AS g(month, account_holder, account_name)
+        JOIN statements s
+            ON COALESCE(s.account_holder, '') = g.account_holder
+            AND COALESCE(s.account_name, '') = g.account_name
+        JOIN transactions t
+            ON t.statement_id = s.id
+            AND t.transaction_date >= g.month
+            AND t.transaction_date < g.month + INTERVAL '1 month'
+        GROUP BY 1, 2, 3, 4;
+    """, (UNCLASSIFIED, *params))
+
+    log.info(f"[monthly_totals] refreshed {len(groups)} month/account group(s)")
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+from pathlib import Path
+from config import get_settings
+from logger import log
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS parse_cache (
+        cache_key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        parser_version TEXT NOT NULL,
+        result TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+_purged_versions: set[str] = set()
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """
+    Opens the cache database, committing on success and always closing it.
+    """
+
+    path = Path(get_settings().PARSE_CACHE_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.execute(_SCHEMA)
+            yield conn
+    finally:
+        conn.close()
+
+def parse_key(text: str, model: str, parser_version: str) -> str:
+    """
+    Builds the cache key for a statement text parsed by a given model and parser version.
+    """
+
+    h = hashlib.sha256()
+    for part in (model, parser_version, text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+
+    return h.hexdigest()
+
+def get_parsed(key: str) -> dict | None:
+    """
+    Returns the cached parse result for a key, or None on a miss.
+    """
+
+    with _connect() as conn:
+        row = conn.execute("SELECT result FROM parse_cache WHERE cache_key = ?", (key,)).fetchone()
+
+    return json.loads(row[0]) if row else None
+
+def put_parsed(key: str, model: str, parser_version: str, result: dict) -> None:
+    """
+    Stores a parse result.
+    """
+
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO parse_cache (cache_key, model, parser_version, result) VALUES (?, ?, ?, ?)",
+            (key, model, parser_version, json.dumps(result)),
+        )
+
+def purge_stale(parser_version: str) -> int:
+    """
+    Deletes results produced by any other parser version, i.e. after the prompt
+    or schema changed. Runs at most once per version per process.
+
+    Returns:
+        int: number of deleted entries
+    """
+
+    if parser_version in _purged_versions:
+        return 0
+
+    with _connect() as conn:
+        deleted = conn.execute("DELETE FROM parse_cache WHERE parser_version != ?", (parser_version,)).rowcount
+
+    _purged_versions.add(parser_version)
+    if deleted:
+        log.info(f"[parse_cache] purged {deleted} result(s) from older parser versions")
+
+    return deleted
@@ -0,0 +1,55 @@
+import asyncio
+import time
+from logger import log
+
+class RateLimiter:
+    """
+    Token-bucket limiter shared by concurrent coroutines calling the same API.
+    Enforces both a requests-per-minute and an optional tokens-per-minute budget.
+    """
+
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int | None = None):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """
+        Waits until one request (and the given number of tokens) fits in the budget, then consumes it.
+        """
+
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        while True:
+            async with self._lock:
+                self._refill()
+
+                request_wait = max(0.0, (1 - self._requests) * 60 / self.requests_per_minute)
+                token_wait = 0.0
+                if self.tokens_per_minute:
+                    token_wait = max(0.0, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+
+                if request_wait == 0 and token_wait == 0:
+                    self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return
+
+                wait = max(request_wait, token_wait)
+
+            log.info(f"[rate_limiter] {self.name}: waiting {wait:.2f}s for capacity")
+            await asyncio.sleep(wait)
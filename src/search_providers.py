@@ -22,7 +22,7 @@ class SerperSearchClient(SearchProvider):
         self.max_results = max_results
 
     async def ainvoke(self, input: dict) -> dict:
-        results = self.client.results(input["query"])
+        results = await self.client.aresults(input["query"])
         items = results.get("organic", [])[:self.max_results]
         return {
             "results": [
@@ -0,0 +1,78 @@
+from functools import lru_cache
+from typing import List
+import tiktoken
+from config import get_settings
+from logger import log
+
+FALLBACK_ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """
+    Returns the tiktoken encoding for a model, or None if it can't be loaded
+    (e.g. the encoding file isn't cached locally and there is no network).
+    """
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:
+        log.warning(f"[tokenizer] no tokenizer for '{model}', estimating from length: {e}")
+        return None
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Counts the tokens in text for a model, falling back to a character-based estimate.
+    """
+
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+def get_chunk_token_budget(model: str) -> int:
+    """
+    Returns the per-chunk input token budget configured for a model.
+    """
+
+    s = get_settings()
+    return s.PARSER_CHUNK_TOKEN_BUDGETS.get(model, s.PARSER_CHUNK_TOKEN_BUDGET)
+
+def chunk_by_tokens(units: List[str], budget: int, model: str, overhead: int = 0) -> List[List[str]]:
+    """
+    Greedily packs consecutive text units (rows, pages, ...) into chunks whose
+    token count stays within budget. A single unit larger than the budget gets
+    a chunk of its own rather than being split.
+
+    Args:
+        units: text units in order
+        budget: maximum tokens per chunk
+        model: model name used to pick the tokenizer
+        overhead: tokens already used by every chunk (headers, prompt, ...)
+
+    Returns:
+        list: chunks of units, in order
+    """
+
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    used = overhead
+
+    for unit in units:
+        tokens = count_tokens(unit, model) + 1  # +1 for the joining newline
+        if current and used + tokens > budget:
+            chunks.append(current)
+            current = []
+            used = overhead
+
+        current.append(unit)
+        used += tokens
+
+    if current:
+        chunks.append(current)
+
+    return chunks
@@ -1,17 +1,32 @@
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-from typing import List
-from dependencies import get_transaction_classifier_llm, get_search_client
+from typing import AsyncIterator, List, Optional
+from dependencies import get_transaction_classifier_llm, get_classifier_rate_limiter, get_db_pool
+from config import get_settings
+from tokenizer import count_tokens
+from collections import deque
 import asyncio
+import hashlib
+import time
 from decimal import Decimal
 from logger import log
 from memory_store import get_item, put_item
+from merchants import merchant_key, lookup_merchants, learn_merchants
+from local_classifier import LocalClassifier, train_local_classifier
+from transaction_reader import iter_transaction_chunks
+from web_context import get_web_context_cache
+from .update_transaction_classification import apply_classifications
 from langchain_core.runnables import RunnableConfig
 from langchain_core.callbacks.manager import adispatch_custom_event
 
+# bump when classification behaviour changes in a way the prompt hash can't see
+CLASSIFIER_REVISION = "1"
 BATCH_SIZE = 50
-DELAY_BETWEEN_BATCHES = 1.0
+# rough output tokens per classified transaction, used for rate-limit budgeting
+OUTPUT_TOKENS_PER_TRANSACTION = 40
 ENRICH_WITH_WEB_CONTEXT = False
+# failed transaction ids returned to the agent; the rest are only counted
+FAILED_IDS_SAMPLE = 50
 PROMPT = """
     1. Classify each transaction into one of the following categories:
         - Groceries
@@ -44,6 +59,9 @@ PROMPT = """
         - deductible_portion
     """
 
+# stored with each classified transaction so rows from an older prompt can be reclassified
+CLASSIFIER_VERSION = f"{CLASSIFIER_REVISION}-{hashlib.sha256(PROMPT.encode('utf-8')).hexdigest()[:8]}"
+
 class Transaction(BaseModel):
     """Input model for a single transaction to classify."""
     transaction_id: int = Field(description="Transaction ID")
@@ -67,20 +85,275 @@ class TransactionClassifications(BaseModel):
     """Container for a list of transaction classifications."""
     results: List[TransactionClassification]
 
+class AdaptiveBatchSizer:
+    """
+    Tunes the classification batch size from observed batches: grows it
+    additively while batches are fast and complete, shrinks it proportionally
+    when a batch is slow or its output nears the model's limit, and halves it
+    when structured output fails or comes back incomplete.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_seconds: float, max_output_tokens: int):
+        self.size = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.max_output_tokens = max_output_tokens
+
+    def observe(self, batch_size: int, seconds: float, output_tokens: int, failed: bool) -> None:
+        previous = self.size
+
+        if failed:
+            self.size = max(self.minimum, batch_size // 2)
+        elif seconds > self.target_seconds or output_tokens > 0.8 * self.max_output_tokens:
+            scale = min(self.target_seconds / seconds, 0.8 * self.max_output_tokens / max(output_tokens, 1))
+            self.size = max(self.minimum, min(self.size, int(batch_size * scale)))
+        elif batch_size >= self.size:
+            self.size = min(self.maximum, self.size + max(1, self.size // 10))
+
+        if self.size != previous:
+            log.info(f"[classify_transactions] batch size {previous} -> {self.size}")
+
+async def _classify_batch(llm, batch: List[dict]) -> tuple[List[TransactionClassification], int]:
+    """
+    Classifies one batch of transactions with a single LLM call.
+
+    Returns:
+        tuple: (classifications, output tokens reported by the model)
+
+    Raises exception if the call fails or the structured output can't be parsed.
+    """
+
+    web_contexts = {}
+    if ENRICH_WITH_WEB_CONTEXT:
+        # one search per merchant, served from the persistent cache where possible
+        # generic payment types ("direct debit", "bpay") name no merchant worth searching for
+        web_contexts = await get_web_context_cache().get_contexts({
+            key: tx["description"] for tx in batch if (key := merchant_key(tx["description"]))
+        })
+
+    enriched = [
+        {
+            "transaction_id": tx["transaction_id"],
+            "description": tx["description"],
+            "web_context": web_contexts.get(merchant_key(tx["description"]), "")
+        }
+        for tx in batch
+    ]
+    prompt = PROMPT
+
+    for entry in enriched:
+        prompt += f"""
+            ---
+            Transaction id: {entry["transaction_id"]}
+            Description: {entry["description"]}
+            Web context: {entry["web_context"]}
+        """
+
+    model = get_settings().CLASSIFIER_MODEL_NAME
+    await get_classifier_rate_limiter().acquire(count_tokens(prompt, model) + OUTPUT_TOKENS_PER_TRANSACTION * len(batch))
+
+    result = await llm.ainvoke(prompt)
+
+    if result.get("parsing_error") is not None or result.get("parsed") is None:
+        raise ValueError(f"structured output failed: {result.get('parsing_error')}")
+
+    usage = getattr(result["raw"], "usage_metadata", None) or {}
+    parsed = result["parsed"]
+    batch_results = parsed.get("results") if isinstance(parsed, dict) else parsed.results
+
+    return [TransactionClassification.model_validate(r) for r in batch_results or []], usage.get("output_tokens", 0)
+
+async def _classify_with_retry(llm, batch: List[dict], sizer: AdaptiveBatchSizer | None = None) -> tuple[List[TransactionClassification], List[int]]:
+    """
+    Classifies a batch, retrying whatever failed or came back missing in
+    smaller pieces until single transactions fail on their own. Only the
+    top-level batch reports to the sizer, so a single bad transaction being
+    isolated doesn't drag the batch size down.
+
+    Returns:
+        tuple: (classifications, IDs of transactions that could not be classified)
+    """
+
+    started = time.monotonic()
+    try:
+        results, output_tokens = await _classify_batch(llm, batch)
+    except Exception as e:
+        log.warning(f"[classify_transactions] batch of {len(batch)} failed: {e}")
+        results, output_tokens = [], 0
+
+    ids = {tx["transaction_id"] for tx in batch}
+    unique = {r.transaction_id: r for r in results if r.transaction_id in ids}
+    missing = [tx for tx in batch if tx["transaction_id"] not in unique]
+
+    if sizer is not None:
+        sizer.observe(len(batch), time.monotonic() - started, output_tokens, failed=bool(missing))
+
+    if not missing:
+        return list(unique.values()), []
+
+    if len(batch) == 1:
+        log.error(f"[classify_transactions] giving up on transaction {batch[0]['transaction_id']}")
+        return list(unique.values()), [batch[0]["transaction_id"]]
+
+    # retry a fully failed batch as two halves, otherwise just the missing part
+    pieces = [missing[:len(missing) // 2], missing[len(missing) // 2:]] if len(missing) == len(batch) else [missing]
+    retried = await asyncio.gather(*[_classify_with_retry(llm, piece) for piece in pieces])
+
+    failed_ids = []
+    for piece_results, piece_failed in retried:
+        unique.update({r.transaction_id: r for r in piece_results})
+        failed_ids.extend(piece_failed)
+
+    return list(unique.values()), failed_ids
+
+async def _classify_chunk(
+    transactions: List[dict],
+    llm,
+    sizer: AdaptiveBatchSizer,
+    local_model: Optional[LocalClassifier],
+    writes: asyncio.Queue,
+    failed_ids: List[int],
+) -> List[TransactionClassification]:
+    """
+    Classifies one chunk of transactions, cheapest source first: the merchant
+    cache, then the local classifier, then the LLM once per unique merchant.
+    Each batch of results is queued for the writer as soon as it is ready;
+    failed transaction ids are appended to failed_ids.
+
+    Returns:
+        list: the chunk's classifications
+    """
+
+    s = get_settings()
+
+    # merchants classified on earlier runs (or earlier chunks) don't need the LLM again;
+    # descriptions that only name a payment type get a key of their own and are never shared
+    merchant_keys = {
+        tx["transaction_id"]: merchant_key(tx["description"]) or f"#{tx['transaction_id']}"
+        for tx in transactions
+    }
+    try:
+        known = await lookup_merchants(
+            [key for key in set(merchant_keys.values()) if not key.startswith("#")],
+            CLASSIFIER_VERSION,
+        )
+    except Exception as e:
+        # the cache only saves LLM calls; without it every merchant goes to the LLM
+        log.warning(f"[classify_transactions] failed to read merchant cache: {e}")
+        known = {}
+
+    all_results = [
+        TransactionClassification(transaction_id=tx["transaction_id"], **known[merchant_keys[tx["transaction_id"]]])
+        for tx in transactions
+        if merchant_keys[tx["transaction_id"]] in known
+    ]
+    transactions = [tx for tx in transactions if merchant_keys[tx["transaction_id"]] not in known]
+
+    log.info(f"[classify_transactions] {len(all_results)} classified from merchant cache, {len(transactions)} remaining")
+
+    # confident predictions from the model trained on our own history skip the LLM;
+    # rows already classified by an older version are being reclassified, and the
+    # model learned from those older labels, so they always go to the LLM
+    unclassified = [tx for tx in transactions if tx.get("category") is None]
+    if local_model is not None and unclassified:
+        predictions = await asyncio.to_thread(local_model.predict, [tx["description"] for tx in unclassified])
+
+        uncertain = [tx for tx in transactions if tx.get("category") is not None]
+        for tx, ((category, is_tax_deductible, deductible_portion), confidence) in zip(unclassified, predictions):
+            if confidence >= s.LOCAL_CLASSIFIER_MIN_CONFIDENCE:
+                all_results.append(TransactionClassification(
+                    transaction_id=tx["transaction_id"],
+                    classification=category,
+                    is_tax_deductible=is_tax_deductible,
+                    deductible_portion=deductible_portion,
+                ))
+            else:
+                uncertain.append(tx)
+
+        log.info(f"[classify_transactions] {len(transactions) - len(uncertain)} classified locally, {len(uncertain)} left for the LLM")
+        transactions = uncertain
+
+    if all_results:
+        await writes.put(list(all_results))
+
+    # classify each merchant once and fan the result out to all of its transactions
+    groups: dict[str, List[int]] = {}
+    representatives = []
+    for tx in transactions:
+        key = merchant_keys[tx["transaction_id"]]
+        if key not in groups:
+            groups[key] = []
+            representatives.append(tx)
+        groups[key].append(tx["transaction_id"])
+
+    if transactions:
+        log.info(
+            f"[classify_transactions] {len(transactions)} transactions -> {len(representatives)} unique merchants "
+            f"(compression {len(transactions) / len(representatives):.1f}x)"
+        )
+
+    pending = deque(representatives)
+
+    async def worker():
+        while pending:
+            batch = [pending.popleft() for _ in range(min(sizer.size, len(pending)))]
+            batch_results, batch_failed = await _classify_with_retry(llm, batch, sizer)
+
+            fanned_out = [
+                r.model_copy(update={"transaction_id": tx_id})
+                for r in batch_results
+                for tx_id in groups[merchant_keys[r.transaction_id]]
+            ]
+            all_results.extend(fanned_out)
+            if fanned_out:
+                await writes.put(fanned_out)
+
+            for tx_id in batch_failed:
+                failed_ids.extend(groups[merchant_keys[tx_id]])
+
+            try:
+                await learn_merchants({
+                    merchant_keys[r.transaction_id]: r.model_dump()
+                    for r in batch_results
+                    if not merchant_keys[r.transaction_id].startswith("#")
+                }, CLASSIFIER_VERSION)
+            except Exception as e:
+                log.warning(f"[classify_transactions] failed to update merchant cache: {e}")
+
+            log.info(f"[classify_transactions] Classified {len(batch_results)}/{len(batch)} transactions, {len(pending)} pending.")
+
+    await asyncio.gather(*[worker() for _ in range(s.CLASSIFIER_MAX_CONCURRENCY)])
+
+    return all_results
+
+async def _single_chunk(transactions: List[dict]) -> AsyncIterator[List[dict]]:
+    if transactions:
+        yield transactions
+
 @tool
 async def classify_transactions(transactions_ref: str, config: RunnableConfig) -> dict:
     """
     Classifies a list of bank transactions into categories and tax deductibility using web context and an LLM.
     Transactions are read from memory using a provided reference ID.
 
+    Results are saved to the transactions table as each batch completes, so
+    no separate update step is needed and an interrupted run resumes from
+    whatever is still unclassified.
+
     Args:
-        transactions_ref (str): UUID key referencing a list of transaction dicts stored in memory.
-            Each transaction must have: transaction_id, description.
+        transactions_ref (str): UUID key from read-transactions. Either a list of
+            transaction dicts (each with transaction_id, description), or, with
+            stream=true, a query that is read and classified in fixed-size chunks.
 
     Returns:
         dict:
             {
-                "classifications_ref": "<ref_id>",
+                "classifications_ref": "<ref_id>",  # {"results": [...], "classifier_version": "..."}; results are empty when streaming
+                "classified": <number of transactions classified>,
+                "persisted": <number of classifications saved>,
+                "failed": <number of transactions that failed>,
+                "failed_ids": [<transaction_id>, ...],  # the first FAILED_IDS_SAMPLE of them
                 "fatal_err": False
             }
             or
@@ -92,64 +365,103 @@ async def classify_transactions(transactions_ref: str, config: RunnableConfig) -
 
     try:
         transactions_data = get_item(transactions_ref)
-        transactions = transactions_data.get("transactions", [])
+        s = get_settings()
 
-        log.info(f"[classify_transactions] classifying {len(transactions)} transactions...")
+        # streamed results are only persisted, so memory stays bounded by the chunk size
+        streaming = "query" in transactions_data
+        if streaming:
+            log.info(f"[classify_transactions] classifying streamed transactions in chunks of {s.READ_CHUNK_SIZE}...")
+            chunks = iter_transaction_chunks(s.READ_CHUNK_SIZE, **transactions_data["query"])
+        else:
+            transactions = transactions_data.get("transactions", [])
+            log.info(f"[classify_transactions] classifying {len(transactions)} transactions...")
+            chunks = _single_chunk(transactions)
 
         await adispatch_custom_event("on_classify_transactions", {"friendly_msg": "Classifying transactions...\n"}, config=config)
 
-        if not transactions:
-            return {"classifications_ref": put_item({"results": []}), "fatal_err": False}
+        # a single writer saves each batch while the next ones are being classified
+        writes: asyncio.Queue[List[TransactionClassification]] = asyncio.Queue(maxsize=2 * s.CLASSIFIER_MAX_CONCURRENCY)
+        failed_ids: List[int] = []
+        persisted = 0
 
-        llm = get_transaction_classifier_llm().with_structured_output(TransactionClassifications)
-        search_client = get_search_client()
+        async def writer():
+            nonlocal persisted
+            pool = get_db_pool()
 
-        batches = [transactions[i:i + BATCH_SIZE] for i in range(0, len(transactions), BATCH_SIZE)]
-        all_results = []
+            while True:
+                results = await writes.get()
+                try:
+                    async with pool.connection() as conn:
+                        try:
+                            await apply_classifications(conn, [r.model_dump() for r in results], CLASSIFIER_VERSION)
+                        except Exception:
+                            await conn.rollback()
+                            raise
+                        await conn.commit()
+                    persisted += len(results)
+                except Exception as e:
+                    log.error(f"[classify_transactions] failed to save {len(results)} classifications: {e}")
+                    failed_ids.extend(r.transaction_id for r in results)
+                finally:
+                    writes.task_done()
 
-        for batch in batches:
-            async def fetch_context(tx: dict):
-                web_context = ""
-                
-                if ENRICH_WITH_WEB_CONTEXT:
-                    results = await search_client.ainvoke({"query": tx["description"]})
-                    web_context = "\n".join(f"- {r.get('title', '')}: {r.get('content', '')}" for r in results.get("results", []))
+        llm = get_transaction_classifier_llm().with_structured_output(TransactionClassifications, include_raw=True)
+        sizer = AdaptiveBatchSizer(
+            initial=BATCH_SIZE,
+            minimum=s.CLASSIFIER_MIN_BATCH_SIZE,
+            maximum=s.CLASSIFIER_MAX_BATCH_SIZE,
+            target_seconds=s.CLASSIFIER_TARGET_BATCH_SECONDS,
+            max_output_tokens=s.CLASSIFIER_MAX_OUTPUT_TOKENS,
+        )
+        local_model: Optional[LocalClassifier] = None
+        kept_results: List[TransactionClassification] = []
+        total = classified = 0
 
-                return {
-                    "transaction_id": tx["transaction_id"],
-                    "description": tx["description"],
-                    "web_context": web_context
-                }
+        writer_task = asyncio.create_task(writer())
+        try:
+            async for chunk in chunks:
+                if s.LOCAL_CLASSIFIER_ENABLED and local_model is None:
+                    local_model = await train_local_classifier(
+                        s.LOCAL_CLASSIFIER_MIN_EXAMPLES,
+                        s.LOCAL_CLASSIFIER_MIN_SIMILARITY,
+                        s.LOCAL_CLASSIFIER_MAX_TRAINING_ROWS,
+                    )
 
-            enriched = await asyncio.gather(*[fetch_context(tx) for tx in batch])
-            prompt = PROMPT
+                total += len(chunk)
+                chunk_results = await _classify_chunk(chunk, llm, sizer, local_model, writes, failed_ids)
+                classified += len(chunk_results)
+                if not streaming:
+                    kept_results.extend(chunk_results)
 
-            for entry in enriched:
-                prompt += f"""
-                    ---
-                    Transaction id: {entry["transaction_id"]}
-                    Description: {entry["description"]}
-                    Web context: {entry["web_context"]}
-                """
+            await writes.join()
+        finally:
+            writer_task.cancel()
+            await chunks.aclose()
 
-            result = await llm.ainvoke(prompt)
+        log.info(f"[classify_transactions] classified {classified}/{total}, saved {persisted}, {len(failed_ids)} failed")
 
-            batch_results = result.get("results") if isinstance(result, dict) else result.results
-            
-            if batch_results is None:
-                batch_results = []
-            
-            all_results.extend(batch_results)
-
-            log.info(f"[classify_transactions] Classified {len(batch_results)} transactions. Sleeping {DELAY_BETWEEN_BATCHES}s.")
-            await asyncio.sleep(DELAY_BETWEEN_BATCHES)
+        if failed_ids and classified == 0:
+            return {
+                "fatal_err": True,
+                "err_details": f"Failed to classify all {len(failed_ids)} transactions."
+            }
 
-        classifications_ref = put_item(TransactionClassifications(results=all_results).dict())
-        return {"classifications_ref": classifications_ref, "fatal_err": False}
+        classifications_ref = put_item({
+            **TransactionClassifications(results=kept_results).dict(),
+            "classifier_version": CLASSIFIER_VERSION,
+        })
+        return {
+            "classifications_ref": classifications_ref,
+            "classified": classified,
+            "persisted": persisted,
+            "failed": len(failed_ids),
+            "failed_ids": failed_ids[:FAILED_IDS_SAMPLE],
+            "fatal_err": False
+        }
 
     except Exception as e:
         log.error(f"[classify_transactions] Failed to classify transactions: {e}")
         return {
             "fatal_err": True,
             "err_details": str(e)
-        }
\ No newline at end of file
+        }
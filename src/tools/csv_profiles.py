@@ -0,0 +1,201 @@
+from dataclasses import dataclass
+from datetime import datetime
+from fnmatch import fnmatch
+from typing import List, Optional
+from config import get_settings
+from logger import log
+from .parse_statements import BankStatement, Transaction
+
+# Day-first formats come before month-first ones since our statements are Australian.
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+    "%d/%m/%y",
+    "%d-%m-%Y",
+    "%d-%m-%y",
+    "%d %b %Y",
+    "%d %b %y",
+    "%d %B %Y",
+    "%Y/%m/%d",
+    "%m/%d/%Y",
+]
+
+@dataclass(frozen=True)
+class CsvProfile:
+    """Column mapping for a known bank CSV export layout."""
+    name: str
+    date: str
+    description: str
+    amount: Optional[str] = None
+    debit: Optional[str] = None
+    credit: Optional[str] = None
+    balance: Optional[str] = None
+    # column holding the account number or name, for exports that include one
+    account: Optional[str] = None
+
+    def columns(self) -> List[str]:
+        return [c for c in (self.date, self.description, self.amount, self.debit, self.credit, self.balance, self.account) if c]
+
+# Header names are compared case-insensitively with surrounding whitespace ignored.
+# More specific profiles must come first.
+CSV_PROFILES: List[CsvProfile] = [
+    CsvProfile(name="account-narrative-debit-credit-balance", account="bank account", date="date", description="narrative", debit="debit amount", credit="credit amount", balance="balance"),
+    CsvProfile(name="debit-credit-balance", date="date", description="description", debit="debit", credit="credit", balance="balance"),
+    CsvProfile(name="debit-credit-amount-balance", date="transaction date", description="narration", debit="debit amount", credit="credit amount", balance="balance"),
+    CsvProfile(name="details-amount-balance", date="date", description="transaction details", amount="amount", balance="balance"),
+    CsvProfile(name="description-amount-balance", date="date", description="description", amount="amount", balance="balance"),
+    CsvProfile(name="transaction-date-amount", date="transaction date", description="description", amount="amount"),
+    CsvProfile(name="description-amount", date="date", description="description", amount="amount"),
+    CsvProfile(name="debit-credit", date="date", description="description", debit="debit", credit="credit"),
+]
+
+def _normalise_header(header: str) -> str:
+    return header.strip().strip("﻿").lower()
+
+def match_profile(headers: List[str]) -> Optional[CsvProfile]:
+    """
+    Returns the first registered profile whose columns all appear in the headers.
+    """
+
+    present = {_normalise_header(h) for h in headers}
+
+    for profile in CSV_PROFILES:
+        if all(column in present for column in profile.columns()):
+            return profile
+
+    return None
+
+def detect_date_format(values: List[str]) -> Optional[str]:
+    """
+    Returns the first date format that parses every non-empty value, or None.
+    """
+
+    samples = [v.strip() for v in values if v and v.strip()]
+    if not samples:
+        return None
+
+    for fmt in DATE_FORMATS:
+        try:
+            for value in samples:
+                datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return fmt
+
+    return None
+
+def configured_account_name(filename: str) -> Optional[str]:
+    """
+    Returns the account name configured for a CSV file name in
+    CSV_ACCOUNT_NAMES ({filename glob: account name}), or None.
+    """
+
+    for pattern, account_name in get_settings().CSV_ACCOUNT_NAMES.items():
+        if fnmatch(filename.lower(), pattern.lower()):
+            return account_name
+
+    return None
+
+def _parse_amount(value: str) -> float:
+    """
+    Parses amounts like "1,234.50", "$-12.00" or "(12.00)".
+    """
+
+    text = value.strip().replace("$", "").replace(",", "")
+    if not text:
+        return 0.0
+
+    if text.startswith("(") and text.endswith(")"):
+        return -float(text[1:-1])
+
+    return float(text)
+
+def build_statement(filename: str, headers: List[str], rows: List[List[str]]) -> Optional[BankStatement]:
+    """
+    Converts a CSV export with a recognised header profile directly into a BankStatement.
+    The account comes from the profile's account column, or else from
+    CSV_ACCOUNT_NAMES. The file name is never used as the account, since
+    statements, transaction fingerprints and monthly totals are keyed on it.
+
+    Returns:
+        BankStatement, or None if the layout is unknown, the rows don't fit the profile
+        or the account can't be identified, in which case the caller should fall back
+        to the LLM parser.
+    """
+
+    profile = match_profile(headers)
+    if profile is None:
+        return None
+
+    index = {_normalise_header(h): i for i, h in enumerate(headers)}
+    rows = [row for row in rows if any(cell.strip() for cell in row)]
+    if not rows:
+        return None
+
+    def cell(row: List[str], column: Optional[str]) -> str:
+        if column is None or index[column] >= len(row):
+            return ""
+        return row[index[column]]
+
+    if profile.account is not None:
+        accounts = {cell(row, profile.account).strip() for row in rows} - {""}
+        if len(accounts) != 1:
+            log.info(f"[csv_profiles] {filename}: matched '{profile.name}' but found {len(accounts)} accounts, falling back")
+            return None
+        account_name = accounts.pop()
+    else:
+        account_name = configured_account_name(filename)
+        if account_name is None:
+            log.info(f"[csv_profiles] {filename}: matched '{profile.name}' but the account is unknown (see CSV_ACCOUNT_NAMES), falling back")
+            return None
+
+    date_format = detect_date_format([cell(row, profile.date) for row in rows])
+    if date_format is None:
+        log.info(f"[csv_profiles] {filename}: matched '{profile.name}' but no date format fits, falling back")
+        return None
+
+    try:
+        entries = []
+        for row in rows:
+            if profile.amount is not None:
+                amount = _parse_amount(cell(row, profile.amount))
+            else:
+                amount = abs(_parse_amount(cell(row, profile.credit))) - abs(_parse_amount(cell(row, profile.debit)))
+
+            balance = cell(row, profile.balance)
+            entries.append((
+                datetime.strptime(cell(row, profile.date).strip(), date_format).date(),
+                cell(row, profile.description).strip(),
+                round(amount, 2),
+                _parse_amount(balance) if balance.strip() else None,
+            ))
+    except ValueError as e:
+        log.info(f"[csv_profiles] {filename}: matched '{profile.name}' but failed to parse rows ({e}), falling back")
+        return None
+
+    # many banks export newest first
+    if entries[0][0] > entries[-1][0]:
+        entries.reverse()
+
+    opening_balance = 0.0
+    closing_balance = 0.0
+    if entries[0][3] is not None and entries[-1][3] is not None:
+        opening_balance = round(entries[0][3] - entries[0][2], 2)
+        closing_balance = entries[-1][3]
+
+    log.info(f"[csv_profiles] {filename}: parsed {len(entries)} rows with profile '{profile.name}' ({date_format})")
+
+    return BankStatement(
+        account_holder="",
+        account_name=account_name,
+        start_date=min(e[0] for e in entries).isoformat(),
+        end_date=max(e[0] for e in entries).isoformat(),
+        opening_balance=opening_balance,
+        closing_balance=closing_balance,
+        credit_limit=0.0,
+        interest_charged=0.0,
+        transactions=[
+            Transaction(transaction_date=d.isoformat(), transaction_details=details, amount=amount)
+            for d, details, amount, _ in entries
+        ],
+    )
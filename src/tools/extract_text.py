@@ -2,44 +2,178 @@ import pdfplumber
 from langchain_core.tools import tool
 from logger import log
 import os
+import re
 import csv
-from typing import List
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List
+from config import get_settings
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.callbacks.manager import adispatch_custom_event
 from memory_store import put_item
+from extraction_cache import file_digest, cache_key, get_cached, put_cached, log_stats
+from .csv_profiles import build_statement, configured_account_name
+from .layout_parsers import parse_with_layouts
+from tokenizer import count_tokens, chunk_by_tokens, get_chunk_token_budget
+from ingest_manifest import file_info, get_ingested_hashes, record_files, STAGE_EXTRACTED
 
-def _extract_pdf_text(path: str) -> dict:
+PDF_EXTRACTOR_VERSION = "pdf-v1"
+CSV_EXTRACTOR_VERSION = "csv-v1"
+
+# pdfplumber's default "lines" table strategy needs at least two horizontal and two
+# vertical ruling edges to form a cell; a rect contributes four edges on its own.
+MIN_TABLE_EDGES = 4
+TRANSACTION_HEADER_PATTERN = re.compile(
+    r"\b(date|transaction|details|description|particulars|debit|credit|withdrawal|deposit|balance|amount)\b",
+    re.IGNORECASE,
+)
+
+def _page_may_have_tables(page, text: str) -> bool:
+    """
+    Cheap pre-screen deciding whether running extract_tables() on a page can pay off:
+    the page needs enough ruling objects to form a table and text that looks like
+    a transaction listing.
     """
-    Extracts the full textual content and tabular data from a PDF file.
+
+    edges = len(page.lines) + len(page.curves) + 4 * len(page.rects)
+    if edges < MIN_TABLE_EDGES:
+        return False
+
+    return len(TRANSACTION_HEADER_PATTERN.findall(text)) >= 2
+
+def _iter_pdf_pages(path: str, fast: bool = False) -> Iterator[dict]:
+    """
+    Yields the text and tables of a PDF one page at a time, releasing each
+    page's parsed objects before moving on so memory stays flat regardless of
+    page count.
 
     Args:
         path: path to the bank statement
+        fast: only run table extraction on pages that pass _page_may_have_tables
 
-    Returns:
-        dict: {"extracted_text": "...", "fatal_err": False} or {"fatal_err": True}
+    Yields:
+        dict: {"page_number": int, "text": str, "tables": [[[cell, ...], ...], ...]}
     """
-    
-    output = ""
-    
+
     with pdfplumber.open(path) as pdf:
         for page in pdf.pages:
-            output += f"\n\n--- Page {page.page_number} ---\n\n"
-            output += page.extract_text() or ""
-            tables = page.extract_tables()
-            if tables:
-                for table in tables:
-                    output += "\n[Table]\n"
-                    for row in table:
-                        output += " | ".join(str(cell) for cell in row) + "\n"
+            try:
+                text = page.extract_text() or ""
+                tables = []
+                if not fast or _page_may_have_tables(page, text):
+                    tables = page.extract_tables() or []
+
+                yield {
+                    "page_number": page.page_number,
+                    "text": text,
+                    "tables": tables,
+                }
+            finally:
+                page.close()
+
+def _format_page(page: dict) -> str:
+    """
+    Renders one page chunk from _iter_pdf_pages as plain text.
+    """
+
+    parts = [f"\n\n--- Page {page['page_number']} ---\n\n", page["text"]]
+    for table in page["tables"]:
+        parts.append("\n[Table]\n")
+        for row in table:
+            parts.append(" | ".join(str(cell) for cell in row) + "\n")
+
+    return "".join(parts)
+
+def _extract_pdf_text(path: str, fast: bool = False) -> dict:
+    """
+    Extracts the full textual content and tabular data from a PDF file,
+    one page at a time so only the formatted text is held, not every page's
+    parsed objects.
+
+    Args:
+        path: path to the bank statement
+        fast: skip table extraction on pages unlikely to contain tables
+
+    Returns:
+        dict: {"extracted_text": "...", "fatal_err": False} or {"fatal_err": True}
+    """
+
+    output = "".join(_format_page(page) for page in _iter_pdf_pages(path, fast))
 
     return {
         "extracted_text": output.strip(),
     }
 
+def _read_csv_rows(path: str) -> dict:
+    """
+    Reads a CSV file into its header row and data rows.
+
+    Returns:
+        dict: {"headers": [...], "rows": [[...], ...]}
+    """
+
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        rows = [row for row in reader]
+
+    return {"headers": headers, "rows": rows}
+
+async def _skip_ingested(paths: List[str], caller: str) -> List[tuple[str, str]]:
+    """
+    Hashes each file and drops the ones the ingest manifest marks as fully written.
+
+    Returns:
+        list: (path, file_hash) pairs still to be processed, in input order
+    """
+
+    hashes = await asyncio.gather(*[asyncio.to_thread(file_digest, path) for path in paths])
+    ingested = await get_ingested_hashes(list(hashes))
+
+    pending = [(path, h) for path, h in zip(paths, hashes) if h not in ingested]
+    if len(pending) < len(paths):
+        log.info(f"[{caller}] skipping {len(paths) - len(pending)} already ingested file(s)")
+
+    return pending
+
+async def _extract_pdfs_in_pool(paths: List[str], fast: bool) -> List[dict]:
+    """
+    Runs _extract_pdf_text over the given paths in worker processes, since
+    pdfplumber is pure CPU and would otherwise block the event loop.
+
+    Returns:
+        list: extraction results in the same order as paths; a file that
+            failed gets {"err_details": "..."} instead of "extracted_text"
+    """
+
+    max_workers = min(get_settings().EXTRACT_MAX_WORKERS or os.cpu_count() or 1, len(paths))
+    log.info(f"[extract_all_pdf_texts] extracting {len(paths)} PDF(s) with {max_workers} worker(s)...")
+
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        results = await asyncio.gather(*[
+            loop.run_in_executor(executor, _extract_pdf_text, path, fast) for path in paths
+        ], return_exceptions=True)
+    finally:
+        # never block the event loop waiting on workers, e.g. when cancelled
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for path, result in zip(paths, results):
+        if isinstance(result, BaseException):
+            log.error(f"[extract_all_pdf_texts] failed to extract {os.path.basename(path)}: {result}")
+
+    return [
+        {"err_details": str(result)} if isinstance(result, BaseException) else result
+        for result in results
+    ]
+
 @tool
 async def extract_all_pdf_texts(folder_path: str, config: RunnableConfig) -> dict:
     """
     Iterates over all PDF files in a folder and extracts their content using extract_text.
+    Statements in a known bank layout that reconcile are converted straight into a parsed statement.
+    Files already fully ingested according to the ingest manifest are skipped.
 
     Args:
         folder_path (str): Path to folder containing PDF files.
@@ -47,10 +181,10 @@ async def extract_all_pdf_texts(folder_path: str, config: RunnableConfig) -> dic
     Returns:
         dict: {
             "batch_refs": ["<ref_id1>", "<ref_id2>", ...],
+            "failed": [{"file": "...", "err_details": "..."}, ...],
             "fatal_err": False
         }
-        or
-        {"fatal_err": True} if any fails.
+        fatal_err is True only if every file failed.
     """
 
     log.info(f"[extract_all_pdf_texts] going through {folder_path}...")
@@ -58,18 +192,60 @@ async def extract_all_pdf_texts(folder_path: str, config: RunnableConfig) -> dic
     await adispatch_custom_event("on_extract_all_pdf_texts", {"friendly_msg": "Extracting PDF text...\n"}, config=config)
 
     ref_ids = []
-    
+
     try:
-        for filename in sorted(os.listdir(folder_path)):
-            if filename.lower().endswith(".pdf"):
-                full_path = os.path.join(folder_path, filename)
-                result = _extract_pdf_text(full_path)
-                content = result.get("extracted_text")
+        paths = [
+            os.path.join(folder_path, filename)
+            for filename in sorted(os.listdir(folder_path))
+            if filename.lower().endswith(".pdf")
+        ]
+
+        pending = await _skip_ingested(paths, "extract_all_pdf_texts")
 
-                ref_id = put_item(content)
-                ref_ids.append(ref_id)
+        fast = get_settings().PDF_FAST_EXTRACTION
+        extractor = f"{PDF_EXTRACTOR_VERSION}-fast" if fast else PDF_EXTRACTOR_VERSION
+        keys = [cache_key(h, extractor) for _, h in pending]
+        results = await asyncio.gather(*[asyncio.to_thread(get_cached, key) for key in keys])
+        misses = [i for i, cached in enumerate(results) if cached is None]
+        log_stats("extract_all_pdf_texts")
 
-        return {"batch_refs": ref_ids, "fatal_err": False}
+        if misses:
+            extracted = await _extract_pdfs_in_pool([pending[i][0] for i in misses], fast)
+
+            for i, result in zip(misses, extracted):
+                results[i] = result
+                if "extracted_text" in result:
+                    await asyncio.to_thread(put_cached, keys[i], result)
+
+        # a file that failed to extract is reported on its own without stopping the others
+        failed = [
+            {"file": os.path.basename(path), "err_details": result["err_details"]}
+            for (path, _), result in zip(pending, results)
+            if "extracted_text" not in result
+        ]
+        extracted_files = [(path, h, result) for (path, h), result in zip(pending, results) if "extracted_text" in result]
+
+        if failed and not extracted_files:
+            return {"fatal_err": True, "err_details": failed[0]["err_details"], "failed": failed}
+
+        await record_files([
+            file_info(path, h, os.path.basename(path)) for path, h, _ in extracted_files
+        ], STAGE_EXTRACTED)
+
+        # results are kept in filename order
+        for _, file_hash, result in extracted_files:
+            content = result.get("extracted_text")
+
+            # recognised bank layouts that reconcile skip the LLM parser entirely
+            statement = parse_with_layouts(content)
+            if statement is not None:
+                ref_ids.append(put_item({"parsed_text": statement, "file_hash": file_hash, "file_refs": 1}))
+                continue
+
+            ref_id = put_item({"extracted_text": content, "file_hash": file_hash, "file_refs": 1})
+            ref_ids.append(ref_id)
+
+        return {"batch_refs": ref_ids, "failed": failed, "fatal_err": False}
 
     except Exception as e:
         log.error(f"[extract_all_pdf_texts] Fatal error: {e}")
@@ -77,11 +253,14 @@ async def extract_all_pdf_texts(folder_path: str, config: RunnableConfig) -> dic
             "fatal_err": True,
             "err_details": str(e)
         }
-    
+
 @tool
 async def extract_all_csv_texts(folder_path: str, config: RunnableConfig) -> dict:
     """
-    Iterates over all CSV files in a folder, extracts their content, and groups them into batches of 100 rows.
+    Iterates over all CSV files in a folder, extracts their content, and groups the rows into batches
+    sized to the parser model's token budget.
+    CSVs matching a known bank export layout are converted straight into a parsed statement.
+    Files already fully ingested according to the ingest manifest are skipped.
 
     Args:
         folder_path (str): Path to folder containing CSV files.
@@ -98,34 +277,56 @@ async def extract_all_csv_texts(folder_path: str, config: RunnableConfig) -> dic
 
     await adispatch_custom_event("on_extract_all_csv_texts", {"friendly_msg": "Extracting CSV text...\n"}, config=config)
 
-    batch_size = 100
+    model = get_settings().PARSER_MODEL_NAME
+    budget = get_chunk_token_budget(model)
     batch_refs: List[str] = []
 
     try:
-        for filename in sorted(os.listdir(folder_path)):
-            if filename.lower().endswith(".csv"):
-                full_path = os.path.join(folder_path, filename)
-
-                with open(full_path, newline='', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    headers = next(reader, [])
-
-                    current_batch = []
-                    for i, row in enumerate(reader, 1):
-                        line = " | ".join(row)
-                        current_batch.append(line)
-
-                        if len(current_batch) == batch_size:
-                            content = f"[CSV File: {filename}]\nHeaders: {' | '.join(headers)}\n\n" + "\n".join(current_batch)
-                            ref_id = put_item(content)
-                            batch_refs.append(ref_id)
-                            current_batch = []
-
-                    # Add remaining rows (final batch)
-                    if current_batch:
-                        content = f"[CSV File: {filename}]\nHeaders: {' | '.join(headers)}\n\n" + "\n".join(current_batch)
-                        ref_id = put_item(content)
-                        batch_refs.append(ref_id)
+        paths = [
+            os.path.join(folder_path, filename)
+            for filename in sorted(os.listdir(folder_path))
+            if filename.lower().endswith(".csv")
+        ]
+
+        pending = await _skip_ingested(paths, "extract_all_csv_texts")
+
+        for full_path, file_hash in pending:
+            filename = os.path.basename(full_path)
+            key = cache_key(file_hash, CSV_EXTRACTOR_VERSION)
+
+            data = await asyncio.to_thread(get_cached, key)
+            if data is None:
+                data = await asyncio.to_thread(_read_csv_rows, full_path)
+                await asyncio.to_thread(put_cached, key, data)
+
+            headers = data["headers"]
+            rows = data["rows"]
+
+            # recognised export layouts skip the LLM parser entirely
+            statement = build_statement(filename, headers, rows)
+            if statement is not None:
+                batch_refs.append(put_item({"parsed_text": statement, "file_hash": file_hash, "file_refs": 1}))
+                continue
+
+            account_name = configured_account_name(filename)
+            account_line = f"Account name: {account_name}\n" if account_name else ""
+            preamble = f"[CSV File: {filename}]\n{account_line}Headers: {' | '.join(headers)}\n\n"
+            lines = [" | ".join(row) for row in rows]
+            batches = chunk_by_tokens(lines, budget, model, overhead=count_tokens(preamble, model))
+            log.info(f"[extract_all_csv_texts] {filename}: {len(lines)} rows in {len(batches)} batch(es) of <= {budget} tokens")
+
+            for current_batch in batches:
+                content = preamble + "\n".join(current_batch)
+                # every batch carries the file's batch count, so later stages can
+                # tell when all of a file's refs have made it through
+                ref_id = put_item({"extracted_text": content, "file_hash": file_hash, "file_refs": len(batches)})
+                batch_refs.append(ref_id)
+
+        await record_files([
+            file_info(path, h, os.path.basename(path)) for path, h in pending
+        ], STAGE_EXTRACTED)
+
+        log_stats("extract_all_csv_texts")
 
         return {"batch_refs": batch_refs, "fatal_err": False}
 
@@ -14,7 +14,7 @@ SCHEMA_HINT = textwrap.dedent("""\
     transactions (
         id SERIAL PRIMARY KEY,
         statement_id INTEGER NOT NULL REFERENCES statements(id) ON DELETE CASCADE,
-        transaction_date TEXT,
+        transaction_date DATE,
         transaction_details TEXT,
         amount NUMERIC(15, 2),
         category TEXT,
@@ -27,8 +27,8 @@ SCHEMA_HINT = textwrap.dedent("""\
         id SERIAL PRIMARY KEY,
         account_holder TEXT,
         account_name TEXT,
-        start_date TEXT,
-        end_date TEXT,
+        start_date DATE,
+        end_date DATE,
         opening_balance NUMERIC(15, 2),
         closing_balance NUMERIC(15, 2),
         credit_limit NUMERIC(15, 2),
@@ -36,6 +36,24 @@ SCHEMA_HINT = textwrap.dedent("""\
         created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
         CONSTRAINT unique_statement UNIQUE (account_holder, account_name, start_date, end_date)
     )
+
+    monthly_category_totals (
+        month DATE NOT NULL,                    -- first day of the month
+        account_holder TEXT NOT NULL,
+        account_name TEXT NOT NULL,
+        category TEXT NOT NULL,                 -- 'Unclassified' until classified
+        total_outflow NUMERIC(15, 2) NOT NULL,  -- sum of money out, as a positive number
+        total_inflow NUMERIC(15, 2) NOT NULL,   -- sum of money in
+        deductible_total NUMERIC(15, 2) NOT NULL, -- tax deductible part of the outflow, positive
+        txn_count INTEGER NOT NULL,
+        PRIMARY KEY (month, account_holder, account_name, category)
+    )
+
+    ### Indexes
+    monthly_category_totals (category, month)
+    transactions (transaction_date)
+    transactions (category, transaction_date)
+    transactions (statement_id)
 """)
 
 class SQLSpec(BaseModel):
@@ -62,10 +80,11 @@ def _get_sys_msg() -> SystemMessage:
             - Travel
             - Unknown
             
-        2.  When a month or year is mentioned, filter `DATE_TRUNC('month', transaction_date) = DATE '2025-04-01'` etc.
+        2.  When a month or year is mentioned, filter with a half-open date range so the indexes are used, e.g. `transaction_date >= DATE '2025-04-01' AND transaction_date < DATE '2025-05-01'`; never wrap transaction_date in a function inside WHERE. Use `DATE_TRUNC('month', transaction_date)` only for grouping.
         3.  When asked for *largest/biggest transactions*, user is intersted in the largest outflows (expenses), which are negative amounts, ignore the positive amounts since they are inflows.
         4.  Transactions that says "ONLINE PAYMENT SYDNEY NS" are cerdit card payments made to the bank by the user, therefore they are not expenses.
         5.  Never modify the schema; only use listed tables/columns.
+        6.  For totals or counts by whole month, category or account (e.g. "how much did I spend on groceries last month", "monthly spending this year", "deductible expenses by category"), query `monthly_category_totals` instead of summing `transactions`; filter whole months with `month >= DATE '2025-01-01' AND month < DATE '2025-04-01'`. Use `transactions` only for individual transactions, merchant/description filters or date ranges that aren't whole months.
 
         {SCHEMA_HINT}
     """)
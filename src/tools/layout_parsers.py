@@ -0,0 +1,203 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import date, datetime
+import re
+from typing import Dict, List, Optional
+from logger import log
+from .parse_statements import BankStatement, Transaction
+
+RECONCILE_TOLERANCE = 0.01
+
+class LayoutParser(ABC):
+    """A deterministic parser for one known statement layout."""
+    name: str
+
+    @abstractmethod
+    def matches(self, text: str) -> bool:
+        """True if the extracted text carries this layout's fingerprint."""
+        pass
+
+    @abstractmethod
+    def parse(self, text: str) -> Optional[BankStatement]:
+        """Parses the extracted text, or returns None if it doesn't fit the layout."""
+        pass
+
+    def reconciles(self, statement: BankStatement) -> bool:
+        """
+        True if opening balance + sum of transactions = closing balance.
+        """
+
+        total = sum(tx.amount for tx in statement.transactions)
+        return abs(statement.opening_balance + total - statement.closing_balance) <= RECONCILE_TOLERANCE
+
+def _parse_amount(value: str) -> float:
+    return float(value.replace("$", "").replace(",", "").strip())
+
+@dataclass
+class RegexLayoutParser(LayoutParser):
+    """
+    Layout described by regexes over the text produced by extract_text.
+
+    fingerprints: patterns that must all be found for the layout to match
+    fields: one pattern per BankStatement header field, the value in group 1
+    transaction_pattern: multiline pattern with named groups date, details,
+        amount and optionally cr; amounts are money out unless marked CR
+    date_formats: strptime formats for transaction and period dates; formats
+        without a year take it from the statement end date
+    credit_card: balances are printed as positive amounts owing
+    """
+    name: str
+    fingerprints: List[str]
+    fields: Dict[str, str]
+    transaction_pattern: str
+    date_formats: List[str]
+    credit_card: bool = False
+    _fingerprints: List[re.Pattern] = field(init=False, repr=False)
+    _transaction: re.Pattern = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._fingerprints = [re.compile(p, re.IGNORECASE) for p in self.fingerprints]
+        self._transaction = re.compile(self.transaction_pattern, re.MULTILINE)
+
+    def matches(self, text: str) -> bool:
+        return all(p.search(text) for p in self._fingerprints)
+
+    def _parse_date(self, value: str, end: Optional[date] = None) -> date:
+        value = " ".join(value.split())
+
+        for fmt in self.date_formats:
+            try:
+                parsed = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+
+            if "%Y" in fmt or "%y" in fmt:
+                return parsed.date()
+            if end is None:
+                raise ValueError(f"date '{value}' has no year")
+
+            # year-less dates belong to the statement period ending at `end`
+            year = end.year if (parsed.month, parsed.day) <= (end.month, end.day) else end.year - 1
+            return parsed.replace(year=year).date()
+
+        raise ValueError(f"unrecognised date '{value}'")
+
+    def _field(self, text: str, name: str) -> Optional[str]:
+        pattern = self.fields.get(name)
+        if pattern is None:
+            return None
+
+        m = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+        return m.group(1).strip() if m else None
+
+    def parse(self, text: str) -> Optional[BankStatement]:
+        values = {name: self._field(text, name) for name in self.fields}
+        required = ["account_name", "start_date", "end_date", "opening_balance", "closing_balance"]
+        if any(values.get(name) is None for name in required):
+            return None
+
+        try:
+            end = self._parse_date(values["end_date"])
+            start = self._parse_date(values["start_date"], end)
+
+            transactions = []
+            for m in self._transaction.finditer(text):
+                amount = abs(_parse_amount(m.group("amount")))
+                if not m.groupdict().get("cr"):
+                    amount = -amount
+
+                transactions.append(Transaction(
+                    transaction_date=self._parse_date(m.group("date"), end).isoformat(),
+                    transaction_details=" ".join(m.group("details").split()),
+                    amount=round(amount, 2),
+                ))
+
+            opening = _parse_amount(values["opening_balance"])
+            closing = _parse_amount(values["closing_balance"])
+            if self.credit_card:
+                # stored with the same sign convention as transactions: owing is negative
+                opening, closing = -opening, -closing
+
+            return BankStatement(
+                account_holder=values.get("account_holder") or "",
+                account_name=values["account_name"],
+                start_date=start.isoformat(),
+                end_date=end.isoformat(),
+                opening_balance=opening,
+                closing_balance=closing,
+                credit_limit=_parse_amount(values["credit_limit"]) if values.get("credit_limit") else 0.0,
+                interest_charged=_parse_amount(values["interest_charged"]) if values.get("interest_charged") else 0.0,
+                transactions=transactions,
+            )
+
+        except ValueError as e:
+            log.info(f"[layout_parsers] {self.name}: {e}")
+            return None
+
+_AMOUNT = r"-?\$?[\d,]+\.\d{2}"
+
+LAYOUT_PARSERS: List[LayoutParser] = [
+    RegexLayoutParser(
+        name="commbank-transaction-account",
+        fingerprints=[r"Commonwealth Bank", r"Opening balance", r"Closing balance"],
+        fields={
+            "account_holder": r"^Name:\s*(.+)$",
+            "account_name": r"^Account (?:Name|type):\s*(.+)$",
+            "start_date": r"Period\s+(\d{1,2} \w{3} \d{4})\s+-\s+\d{1,2} \w{3} \d{4}",
+            "end_date": r"Period\s+\d{1,2} \w{3} \d{4}\s+-\s+(\d{1,2} \w{3} \d{4})",
+            "opening_balance": rf"Opening balance\s+({_AMOUNT})",
+            "closing_balance": rf"Closing balance\s+({_AMOUNT})",
+        },
+        transaction_pattern=rf"^(?P<date>\d{{2}} \w{{3}})\s+(?P<details>.+?)\s+(?P<amount>{_AMOUNT})(?P<cr>\s*CR)?\s+\(?{_AMOUNT}\)?(?:\s*CR)?$",
+        date_formats=["%d %b %Y", "%d %b"],
+    ),
+    RegexLayoutParser(
+        name="anz-credit-card",
+        fingerprints=[r"\bANZ\b", r"Credit Limit", r"Closing Balance"],
+        fields={
+            "account_holder": r"^Account Holder:?\s*(.+)$",
+            "account_name": r"^(ANZ [\w ]+?(?:Visa|Mastercard|Card))\b",
+            "start_date": r"Statement Period\s+(\d{2}/\d{2}/\d{4})",
+            "end_date": r"Statement Period\s+\d{2}/\d{2}/\d{4}\s*-\s*(\d{2}/\d{2}/\d{4})",
+            "opening_balance": rf"Opening Balance\s+({_AMOUNT})",
+            "closing_balance": rf"Closing Balance\s+({_AMOUNT})",
+            "credit_limit": rf"Credit Limit\s+({_AMOUNT})",
+            "interest_charged": rf"Interest Charged\s+({_AMOUNT})",
+        },
+        transaction_pattern=rf"^(?P<date>\d{{2}}/\d{{2}}/\d{{4}})\s+\d{{2}}/\d{{2}}/\d{{4}}\s+(?P<details>.+?)\s+(?P<amount>{_AMOUNT})(?P<cr>\s*CR)?$",
+        date_formats=["%d/%m/%Y"],
+        credit_card=True,
+    ),
+]
+
+def parse_with_layouts(text: str) -> Optional[BankStatement]:
+    """
+    Tries each registered layout parser whose fingerprint matches the text.
+    A result is only trusted if it has transactions and reconciles; otherwise
+    the caller should fall back to the LLM parser.
+
+    Returns:
+        BankStatement, or None if no layout produced a reconciled statement.
+    """
+
+    for parser in LAYOUT_PARSERS:
+        if not parser.matches(text):
+            continue
+
+        statement = parser.parse(text)
+        if statement is None or not statement.transactions:
+            log.info(f"[layout_parsers] {parser.name} matched but could not parse, falling back")
+            continue
+
+        if not parser.reconciles(statement):
+            total = sum(tx.amount for tx in statement.transactions)
+            log.info(
+                f"[layout_parsers] {parser.name} did not reconcile "
+                f"(opening {statement.opening_balance} + {total:.2f} != closing {statement.closing_balance}), falling back"
+            )
+            continue
+
+        log.info(f"[layout_parsers] parsed {len(statement.transactions)} transactions with {parser.name}")
+        return statement
+
+    return None
@@ -1,4 +1,10 @@
-from dependencies import get_text_parser_llm
+from dependencies import get_text_parser_llm, get_parser_rate_limiter
+from config import get_settings
+from tokenizer import count_tokens, chunk_by_tokens, get_chunk_token_budget
+import re
+import hashlib
+import json
+from parse_cache import parse_key, get_parsed, put_parsed, purge_stale
 from typing import List
 from pydantic import BaseModel, Field
 from logger import log
@@ -8,8 +14,10 @@ from langchain_core.callbacks.manager import adispatch_custom_event
 import asyncio
 from decimal import Decimal
 from memory_store import get_item, put_item
+from ingest_manifest import completed_files, record_files, STAGE_PARSED
 
-DELAY_BETWEEN_BATCHES = 1.0
+# bump when parsing behaviour changes in a way the prompt/schema hash can't see
+PARSER_VERSION = "2"
 PARSING_RULES_PROMPT = """
 You are parsing Australian bank statements into JSON that matches the BankStatement schema EXACTLY.
 
@@ -23,6 +31,19 @@ Sign convention:
 - Do NOT include "CR"/"DR" text—use the sign only.
 - Use YYYY-MM-DD dates and include every transaction in order.
 """
+HEADER_PROMPT = """
+The text below is the first and last page of a longer statement.
+Extract only the statement details (account, period, balances, limits, interest); transactions are parsed separately.
+"""
+TRANSACTIONS_PROMPT = """
+The text below is a run of consecutive pages from a longer statement.
+Extract only the transactions on these pages, in order. Ignore opening/closing balance lines.
+"""
+STATEMENT_PERIOD_PROMPT = """
+The statement period is {start_date} to {end_date}. Dates printed without a year (e.g. "12 Mar")
+fall within this period: give them the year that places them inside it.
+"""
+PAGE_BREAK_PATTERN = re.compile(r"(?=--- Page \d+ ---)")
 
 class Transaction(BaseModel):
     """A single transaction in the bank statement."""
@@ -42,16 +63,124 @@ class BankStatement(BaseModel):
     interest_charged: float = Field(description="Interest charges for the period")
     transactions: List[Transaction] = Field(description="List of transactions")
 
+class StatementHeader(BaseModel):
+    """Statement details without transactions."""
+    account_holder: str = Field(description="Name of the account holder")
+    account_name: str = Field(description="Name or label of the account")
+    start_date: str = Field(description="Statement start date in YYYY-MM-DD format")
+    end_date: str = Field(description="Statement end date in YYYY-MM-DD format")
+    opening_balance: float = Field(description="Opening balance at the start of the period")
+    closing_balance: float = Field(description="Closing balance at the end of the period")
+    credit_limit: float = Field(description="Credit limit (if applicable)")
+    interest_charged: float = Field(description="Interest charges for the period")
+
+class TransactionPage(BaseModel):
+    """Transactions found on a run of statement pages."""
+    transactions: List[Transaction] = Field(description="List of transactions")
+
+async def _invoke_parser(schema: type[BaseModel], prompt: str) -> BaseModel:
+    """
+    Runs one structured-output parser call under the shared rate limiter.
+    """
+
+    # budget for the prompt plus a structured output of similar size
+    await get_parser_rate_limiter().acquire(2 * count_tokens(prompt, get_settings().PARSER_MODEL_NAME))
+
+    llm = get_text_parser_llm().with_structured_output(schema)
+    return await llm.ainvoke(prompt)
+
+def _split_pages(text: str) -> List[str]:
+    """
+    Splits extracted PDF text on the "--- Page N ---" markers written by extract_text.
+    """
+
+    return [page for page in PAGE_BREAK_PATTERN.split(text) if page.strip()]
+
+async def _parse_statement_chunked(pages: List[str], chunks: List[List[str]]) -> BankStatement:
+    """
+    Parses a long statement as a header call followed by one transaction call
+    per chunk of pages in parallel, and merges the results into one BankStatement.
+    Each chunk is given the statement period from the header, since middle pages
+    often print dates without a year.
+    """
+
+    header_text = pages[0] if len(pages) == 1 else pages[0] + pages[-1]
+    header_prompt = PARSING_RULES_PROMPT + HEADER_PROMPT + "\n\n---\n\n" + header_text
+    header: StatementHeader = await _invoke_parser(StatementHeader, header_prompt)
+
+    period_prompt = STATEMENT_PERIOD_PROMPT.format(start_date=header.start_date, end_date=header.end_date)
+    chunk_prompts = [
+        PARSING_RULES_PROMPT + TRANSACTIONS_PROMPT + period_prompt + "\n\n---\n\n" + "".join(chunk)
+        for chunk in chunks
+    ]
+
+    pages_parsed = await asyncio.gather(*[_invoke_parser(TransactionPage, prompt) for prompt in chunk_prompts])
+
+    # chunks cover disjoint pages, so identical transactions either side of a
+    # page break are genuine repeats and are all kept
+    transactions = [tx for p in pages_parsed for tx in p.transactions]
+
+    return BankStatement(**header.model_dump(), transactions=transactions)
+
+def _parser_version() -> str:
+    """
+    Identifies the current prompts and output schema, so cached parse results
+    are invalidated whenever either changes.
+    """
+
+    h = hashlib.sha256()
+    for part in (PARSER_VERSION, PARSING_RULES_PROMPT, HEADER_PROMPT, TRANSACTIONS_PROMPT, STATEMENT_PERIOD_PROMPT, json.dumps(BankStatement.model_json_schema(), sort_keys=True)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+
+    return h.hexdigest()[:16]
+
 async def _parse_statement_text(text: str) -> dict:
     """
-    Parses raw bank-statement text into structured data.
+    Parses raw bank-statement text into structured data, reusing a cached
+    result for the same text, parser model and parser version.
+
+    Returns:
+        dict: { "parsed_text": BankStatement }
+    """
+
+    model = get_settings().PARSER_MODEL_NAME
+    version = _parser_version()
+    key = parse_key(text, model, version)
+
+    await asyncio.to_thread(purge_stale, version)
+    cached = await asyncio.to_thread(get_parsed, key)
+    if cached is not None:
+        log.info(f"[parse_statements] parse cache hit {key[:12]}")
+        return {"parsed_text": BankStatement.model_validate(cached)}
+
+    result = await _parse_statement_text_uncached(text, model)
+    await asyncio.to_thread(put_parsed, key, model, version, result["parsed_text"].model_dump())
+
+    return result
+
+async def _parse_statement_text_uncached(text: str, model: str) -> dict:
+    """
+    Parses raw bank-statement text with the LLM. Statements over the parser
+    model's chunk token budget are split on page boundaries and parsed with
+    _parse_statement_chunked.
 
     Returns:
         dict: { "parsed_text": BankStatement }
     """
 
-    llm = get_text_parser_llm().with_structured_output(BankStatement)
-    response: BankStatement = await llm.ainvoke(PARSING_RULES_PROMPT + "\n\n---\n\n" + text)
+    pages = _split_pages(text)
+
+    if len(pages) > 1:
+        period = STATEMENT_PERIOD_PROMPT.format(start_date="YYYY-MM-DD", end_date="YYYY-MM-DD")
+        overhead = count_tokens(PARSING_RULES_PROMPT + TRANSACTIONS_PROMPT + period, model)
+        chunks = chunk_by_tokens(pages, get_chunk_token_budget(model), model, overhead=overhead)
+
+        if len(chunks) > 1:
+            log.info(f"[parse_statements] parsing {len(pages)} pages in {len(chunks)} chunks")
+            return {"parsed_text": await _parse_statement_chunked(pages, chunks)}
+
+    response: BankStatement = await _invoke_parser(BankStatement, PARSING_RULES_PROMPT + "\n\n---\n\n" + text)
 
     return {"parsed_text": response}
 
@@ -62,26 +191,68 @@ async def parse_all_statements(ref_ids: List[str], config: RunnableConfig) -> di
     """
     Parses multiple plain-text statements (referenced via memory keys) into
     structured JSON, returning new memory keys of parsed results.
+    Entries that are already parsed are passed through without an LLM call.
+    Statements are parsed concurrently; a failed statement is reported in
+    "failed" without aborting the others.
+    A source file is marked as parsed in the ingest manifest only once every
+    one of the refs it was split into at extraction is parsed.
+
+    Returns:
+        dict: {
+            "parsed_refs": ["<ref_id1>", ...],
+            "failed": [{"ref_id": "...", "err_details": "..."}, ...],
+            "fatal_err": False
+        }
+        fatal_err is True only if every statement failed.
     """
     log.info(f"[parse_all_statements] parsing {len(ref_ids)} statement(s)…")
 
     await adispatch_custom_event("on_parse_all_statements", {"friendly_msg": "Parsing text...\n"}, config=config)
 
-    parsed_refs = []
+    semaphore = asyncio.Semaphore(get_settings().PARSER_MAX_CONCURRENCY)
 
-    for i, ref_id in enumerate(ref_ids):
+    async def parse_one(i: int, ref_id: str) -> dict:
         try:
-            log.info(f"[parse_all_statements] parsing {ref_id} ({i+1}/{len(ref_ids)})")
-            raw_text = get_item(ref_id)
-            result = await _parse_statement_text(raw_text)
-            parsed_ref = put_item({"parsed_text": result["parsed_text"]})
-            parsed_refs.append(parsed_ref)
+            entry = get_item(ref_id)
+
+            source = {"ref_id": ref_id, "file_hash": entry.get("file_hash"), "file_refs": entry.get("file_refs", 1)}
+
+            # already converted in-process (e.g. a recognised CSV layout)
+            if "parsed_text" in entry:
+                return {**source, "parsed_ref": ref_id}
 
-            log.info(f"[parse_all_statements] parsed {i+1}/{len(ref_ids)} → sleep {DELAY_BETWEEN_BATCHES}s")
-            await asyncio.sleep(DELAY_BETWEEN_BATCHES)
+            async with semaphore:
+                log.info(f"[parse_all_statements] parsing {ref_id} ({i+1}/{len(ref_ids)})")
+                result = await _parse_statement_text(entry["extracted_text"])
+
+            parsed_ref = put_item({
+                "parsed_text": result["parsed_text"],
+                "file_hash": entry.get("file_hash"),
+                "file_refs": entry.get("file_refs", 1),
+            })
+            log.info(f"[parse_all_statements] parsed {ref_id} ({i+1}/{len(ref_ids)})")
+
+            return {**source, "parsed_ref": parsed_ref}
 
         except Exception as e:
             log.error(f"[parse_all_statements] exception at index {i}: {e}")
-            return {"fatal_err": True, "err_details": str(e)}
+            return {"ref_id": ref_id, "err_details": str(e)}
+
+    outcomes = await asyncio.gather(*[parse_one(i, ref_id) for i, ref_id in enumerate(ref_ids)])
+
+    parsed_refs = [o["parsed_ref"] for o in outcomes if "parsed_ref" in o]
+    failed = [o for o in outcomes if "err_details" in o]
+    # a file is only parsed once every one of its batches is
+    parsed_hashes = completed_files([o for o in outcomes if "parsed_ref" in o])
+
+    if failed and not parsed_refs:
+        return {"fatal_err": True, "err_details": failed[0]["err_details"], "failed": failed}
+
+    try:
+        await record_files([{"file_hash": h} for h in parsed_hashes], STAGE_PARSED)
+    except Exception as e:
+        log.warning(f"[parse_all_statements] failed to update ingest manifest: {e}")
+
+    log.info(f"[parse_all_statements] parsed {len(parsed_refs)}/{len(ref_ids)}, {len(failed)} failed")
 
-    return {"parsed_refs": parsed_refs, "fatal_err": False}
+    return {"parsed_refs": parsed_refs, "failed": failed, "fatal_err": False}
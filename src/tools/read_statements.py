@@ -1,19 +1,16 @@
 from dependencies import get_db_pool
-import json
-from decimal import Decimal
 from psycopg.rows import dict_row
 from logger import log
 from typing import Optional
 from langchain_core.tools import tool
 from memory_store import put_item
+from transaction_reader import transactions_query, to_transaction
+from .classify_transactions import CLASSIFIER_VERSION
 from langchain_core.runnables import RunnableConfig
 from langchain_core.callbacks.manager import adispatch_custom_event
 
-def _to_float(value):
-    return float(value) if isinstance(value, Decimal) else value
-
 @tool
-async def read_transactions(config: RunnableConfig, start_date: Optional[str] = None, end_date: Optional[str] = None) -> dict:
+async def read_transactions(config: RunnableConfig, start_date: Optional[str] = None, end_date: Optional[str] = None, only_unclassified: bool = False, stream: bool = False) -> dict:
     """
     Reads transaction data for a given period from the transactions table and stores
     the result in memory. Returns a reference ID to retrieve it later.
@@ -21,11 +18,16 @@ async def read_transactions(config: RunnableConfig, start_date: Optional[str] =
     Args:
         start_date: Optional ISO date string (YYYY-MM-DD)
         end_date: Optional ISO date string (YYYY-MM-DD)
+        only_unclassified: Only return transactions that are unclassified or were
+            classified by an older classifier version, i.e. the ones that need classifying
+        stream: Don't read anything now; return a ref that classify-transactions reads
+            in fixed-size, keyset-paged chunks. Use for large histories.
 
     Returns:
         dict:
             {
                 "transactions_ref": "<ref_id>",
+                "streaming": True,  # only when stream=True
                 "fatal_err": False
             }
             or
@@ -39,27 +41,21 @@ async def read_transactions(config: RunnableConfig, start_date: Optional[str] =
     await adispatch_custom_event("on_read_transactions", {"friendly_msg": "Retrieving transactions...\n"}, config=config)
 
     try:
+        classifier_version = CLASSIFIER_VERSION if only_unclassified else None
+
+        if stream:
+            ref_id = put_item({"query": {
+                "start_date": start_date,
+                "end_date": end_date,
+                "classifier_version": classifier_version,
+            }})
+            return {"transactions_ref": ref_id, "streaming": True, "fatal_err": False}
+
+        sql, params = transactions_query(start_date, end_date, classifier_version)
+
         pool = get_db_pool()
         async with pool.connection() as conn:
             async with conn.cursor(row_factory=dict_row) as cur:
-                sql = """
-                    SELECT 
-                        id as transaction_id,
-                        transaction_date,
-                        transaction_details,
-                        amount,
-                        category,
-                        statement_id,
-                        created_at
-                    FROM transactions
-                """
-                params = []
-                if start_date and end_date:
-                    sql += " WHERE transaction_date BETWEEN %s AND %s"
-                    params = [start_date, end_date]
-
-                sql += " ORDER BY transaction_date ASC"
-
                 await cur.execute(sql, params)
                 rows = await cur.fetchall()
 
@@ -69,18 +65,7 @@ async def read_transactions(config: RunnableConfig, start_date: Optional[str] =
                 
                 log.info(f"[read_transactions] read {len(rows)} transactions...")
 
-                transactions = [
-                    {
-                        "transaction_id": row["transaction_id"],
-                        "transaction_date": row["transaction_date"],
-                        "description": row["transaction_details"],
-                        "amount": _to_float(row["amount"]),
-                        "category": row.get("category"),
-                        "statement_id": row["statement_id"],
-                        "created_at": row["created_at"].isoformat() if row["created_at"] else None
-                    }
-                    for row in rows
-                ]
+                transactions = [to_transaction(row) for row in rows]
 
                 ref_id = put_item({"transactions": transactions})
                 return {"transactions_ref": ref_id, "fatal_err": False}
@@ -2,8 +2,52 @@ from dependencies import get_db_pool
 from langchain_core.tools import tool
 from logger import log
 from memory_store import get_item
+from monthly_totals import refresh_monthly_totals
 from langchain_core.runnables import RunnableConfig
 from langchain_core.callbacks.manager import adispatch_custom_event
+from psycopg import AsyncConnection
+from decimal import Decimal
+
+async def apply_classifications(conn: AsyncConnection, results: list[dict], classifier_version: str | None) -> None:
+    """
+    Writes classification results to the transactions table on the given
+    connection and refreshes the affected monthly_category_totals rows.
+    The caller owns the transaction and decides when to commit.
+
+    Args:
+        results: dicts with transaction_id, classification, is_tax_deductible, deductible_portion
+        classifier_version: version that produced the results
+
+    Raises exception on failure.
+    """
+
+    if not results:
+        return
+
+    # one set-based UPDATE per call instead of a round trip per row
+    async with conn.cursor() as cur:
+        await cur.execute("""
+            UPDATE 
+                transactions AS t
+            SET 
+                category = r.category,
+                is_tax_deductible = r.is_tax_deductible,
+                deductible_portion = r.deductible_portion,
+                classifier_version = %s
+            FROM 
+                unnest(%s::int[], %s::text[], %s::boolean[], %s::numeric[])
+                    AS r(id, category, is_tax_deductible, deductible_portion)
+            WHERE 
+                t.id = r.id;
+            """, (
+                classifier_version,
+                [item["transaction_id"] for item in results],
+                [item["classification"] for item in results],
+                [item["is_tax_deductible"] for item in results],
+                [Decimal(str(item["deductible_portion"])) for item in results],
+            ))
+
+        await refresh_monthly_totals(cur, transaction_ids=[item["transaction_id"] for item in results])
 
 @tool
 async def update_transaction_classification(classifications_ref: str, config: RunnableConfig) -> dict:
@@ -20,7 +64,8 @@ async def update_transaction_classification(classifications_ref: str, config: Ru
                         classification,
                         is_tax_deductible,
                         deductible_portion
-                    }, ... ] }
+                    }, ... ],
+                "classifier_version": "<version that produced the results>" }
 
     Returns:
         dict:
@@ -35,6 +80,7 @@ async def update_transaction_classification(classifications_ref: str, config: Ru
     try:
         data = get_item(classifications_ref)
         results = data.get("results", [])
+        classifier_version = data.get("classifier_version")
 
         if not results:
             log.warning("[update_transaction_classification] no classifications to update.")
@@ -44,35 +90,18 @@ async def update_transaction_classification(classifications_ref: str, config: Ru
 
         pool = get_db_pool()
         async with pool.connection() as conn:
-            async with conn.cursor() as cur:
-                for i, item in enumerate(results):
-                    try:
-                        tx_id = item["transaction_id"]
-                        category = item["classification"]
-                        is_tax_deductible = item["is_tax_deductible"]
-                        deductible_portion = item["deductible_portion"]
-                        sql = f"""
-                            UPDATE 
-                                transactions
-                            SET 
-                                category = '{category}',
-                                is_tax_deductible = {is_tax_deductible},
-                                deductible_portion = {deductible_portion}
-                            WHERE 
-                                id = {tx_id};
-                            """
-
-                        await cur.execute(sql)
-                    except Exception as e:
-                        log.error(f"[update_transaction_classification] failed on item {i}: {e}")
-                        await conn.rollback()
-                        return {
-                            "fatal_err": True,
-                            "err_details": str(e)
-                        }
-
-                await conn.commit()
-                return {"fatal_err": False}
+            try:
+                await apply_classifications(conn, results, classifier_version)
+            except Exception as e:
+                log.error(f"[update_transaction_classification] failed: {e}")
+                await conn.rollback()
+                return {
+                    "fatal_err": True,
+                    "err_details": str(e)
+                }
+
+            await conn.commit()
+            return {"fatal_err": False}
 
     except Exception as e:
         log.error(f"[update_transaction_classification] unknown error: {e}")
@@ -1,18 +1,122 @@
 from dependencies import get_db_pool
+from config import get_settings
 from langchain_core.tools import tool
+import asyncio
+import hashlib
 import json
+from decimal import Decimal, ROUND_HALF_UP
 from logger import log
 from psycopg import AsyncConnection, AsyncCursor
 from memory_store import get_item
+from ingest_manifest import completed_files, record_stage, STAGE_WRITTEN
+from monthly_totals import refresh_monthly_totals
 from langchain_core.runnables import RunnableConfig
 from langchain_core.callbacks.manager import adispatch_custom_event
 
-async def _write_statement(json_str: str, conn: AsyncConnection, cur: AsyncCursor) -> None:
+def transaction_fingerprints(statement: dict) -> list[str]:
     """
-    Writes structured bank statement into database.
+    Content fingerprint for each transaction of a statement: account, date,
+    details, amount and the ordinal among identical transactions. The same
+    transaction gets the same fingerprint from any statement of that account,
+    so overlapping periods don't create duplicates while genuine repeats
+    (two identical coffees on one day) are kept.
+
+    db/migrations/0005_backfill_transaction_fingerprints.sql computes the
+    same value in SQL; keep the two in step.
+    """
+
+    seen: dict[tuple, int] = {}
+    fingerprints = []
+
+    for tx in statement["transactions"]:
+        content = (
+            statement["account_holder"] or "",
+            statement["account_name"] or "",
+            str(tx["transaction_date"]),
+            " ".join(str(tx["transaction_details"] or "").split()),
+            # NUMERIC(15, 2) rounds half away from zero and has no -0
+            f"{Decimal(str(tx['amount'])).quantize(Decimal('0.01'), ROUND_HALF_UP) + 0:f}",
+        )
+        ordinal = seen.get(content, 0)
+        seen[content] = ordinal + 1
+
+        fingerprints.append(hashlib.sha256("\x1f".join([*content, str(ordinal)]).encode("utf-8")).hexdigest())
+
+    return fingerprints
+
+async def _copy_transactions(cur: AsyncCursor, statement_id: int, statement: dict) -> int:
+    """
+    Loads a statement's transactions with COPY FROM STDIN into a staging table
+    in one round trip, then inserts the ones whose fingerprint isn't already stored.
+
+    Returns:
+        int: number of transactions inserted
+    """
+
+    await cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS transactions_staging
+            (
+                statement_id INTEGER,
+                transaction_date DATE,
+                transaction_details TEXT,
+                amount NUMERIC(15, 2),
+                fingerprint TEXT
+            )
+        ON COMMIT DELETE ROWS;
+    """)
+    await cur.execute("TRUNCATE transactions_staging;")
+
+    async with cur.copy("""
+        COPY transactions_staging
+            (
+                statement_id,
+                transaction_date,
+                transaction_details,
+                amount,
+                fingerprint
+            )
+        FROM STDIN
+    """) as copy:
+        for tx, fingerprint in zip(statement["transactions"], transaction_fingerprints(statement)):
+            await copy.write_row((
+                statement_id,
+                tx['transaction_date'],
+                tx['transaction_details'],
+                tx['amount'],
+                fingerprint
+            ))
+
+    await cur.execute("""
+        INSERT INTO transactions
+            (
+                statement_id,
+                transaction_date,
+                transaction_details,
+                amount,
+                fingerprint
+            )
+        SELECT
+            statement_id,
+            transaction_date,
+            transaction_details,
+            amount,
+            fingerprint
+        FROM transactions_staging
+        ON CONFLICT (fingerprint) DO NOTHING;
+    """)
+
+    return cur.rowcount
+
+async def _write_statement(json_str: str, conn: AsyncConnection, cur: AsyncCursor) -> int:
+    """
+    Writes structured bank statement into database. Writing a statement that
+    is already stored updates its header and adds only missing transactions.
     
     Args:
         json_str: A valid JSON string containing parsed bank statement data
+
+    Returns:
+        int: ID of the inserted or existing statement
     
     Raises exception on failure.
     """
@@ -33,6 +137,11 @@ async def _write_statement(json_str: str, conn: AsyncConnection, cur: AsyncCurso
             )
         VALUES 
             (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT ON CONSTRAINT unique_statement DO UPDATE SET
+            opening_balance = EXCLUDED.opening_balance,
+            closing_balance = EXCLUDED.closing_balance,
+            credit_limit = EXCLUDED.credit_limit,
+            interest_charged = EXCLUDED.interest_charged
         RETURNING id;
     """, (
         parsed_data["account_holder"],
@@ -52,23 +161,15 @@ async def _write_statement(json_str: str, conn: AsyncConnection, cur: AsyncCurso
 
     statement_id = row[0]
 
-    for tx in parsed_data["transactions"]:
-        await cur.execute("""
-            INSERT INTO transactions 
-                (
-                    statement_id, 
-                    transaction_date, 
-                    transaction_details, 
-                    amount
-                )
-            VALUES 
-                (%s, %s, %s, %s);
-        """, (
-            statement_id,
-            tx['transaction_date'],
-            tx['transaction_details'],
-            tx['amount']
-        ))
+    inserted = await _copy_transactions(cur, statement_id, parsed_data)
+    if inserted:
+        await refresh_monthly_totals(cur, statement_ids=[statement_id])
+    log.info(
+        f"[write_all_statements] statement {statement_id}: {inserted} new transactions, "
+        f"{len(parsed_data['transactions']) - inserted} already stored"
+    )
+
+    return statement_id
 
 @tool
 async def write_all_statements(parsed_refs: list[str], config: RunnableConfig) -> dict:
@@ -77,7 +178,15 @@ async def write_all_statements(parsed_refs: list[str], config: RunnableConfig) -
     to parsed statement objects.
 
     Each parsed_ref should point to a dictionary like:
-        {"parsed_text": <BankStatement schema-compatible dict>}
+        {"parsed_text": <BankStatement schema-compatible dict>, "file_hash": "<source file hash>", "file_refs": <refs the file was split into>}
+
+    Statements are written concurrently, each in its own transaction, so a
+    failed statement is reported in "failed" without rolling back the others.
+    A source file is marked as written in the ingest manifest once all of its
+    file_refs statements are written, counted against the split recorded at
+    extraction rather than the refs passed here.
+    Writes are idempotent: statements already stored are updated in place and
+    transactions already stored (by fingerprint) are skipped.
 
     Args:
         parsed_refs (List[str]): List of reference keys in memory store
@@ -85,12 +194,11 @@ async def write_all_statements(parsed_refs: list[str], config: RunnableConfig) -
     Returns:
         dict:
             {
+                "written": [{"ref_id": "...", "statement_id": <id>}, ...],
+                "failed": [{"ref_id": "...", "err_details": "..."}, ...],
                 "fatal_err": False
             }
-            or
-            {
-                "fatal_err": True
-            } if any statement fails.
+            fatal_err is True only if every statement failed.
     """
 
     log.info(f"[write_all_statements] saving {len(parsed_refs)} statements to database...")
@@ -99,32 +207,71 @@ async def write_all_statements(parsed_refs: list[str], config: RunnableConfig) -
 
     try:
         pool = get_db_pool()
+        semaphore = asyncio.Semaphore(get_settings().WRITER_MAX_CONCURRENCY)
+
+        entries = {}
+        for ref_id in parsed_refs:
+            try:
+                entries[ref_id] = get_item(ref_id)
+            except Exception:
+                # reported by write_one like any other failed statement
+                entries[ref_id] = {}
+
+        async def write_one(i: int, ref_id: str) -> dict:
+            entry = entries[ref_id]
+            file_hash = entry.get("file_hash")
+            file_refs = entry.get("file_refs", 1)
 
-        async with pool.connection() as conn:
-            async with conn.cursor() as cur:
-                for i, ref_id in enumerate(parsed_refs):
+            try:
+                if "parsed_text" not in entry:
+                    raise Exception(f"Memory store key '{ref_id}' not found, expired or not parsed.")
+
+                async with semaphore, pool.connection() as conn:
                     log.info(f"[write_all_statements] inserting statement {i + 1} from ref {ref_id}...")
 
-                    try:
-                        entry = get_item(ref_id)
-                        json_str = json.dumps(entry["parsed_text"].dict())
+                    async with conn.transaction():
+                        async with conn.cursor() as cur:
+                            json_str = json.dumps(entry["parsed_text"].dict())
+                            statement_id = await _write_statement(json_str, conn, cur)
+
+                            # files split across several refs are recorded once all of them succeed
+                            if file_hash and file_refs == 1:
+                                await record_stage(cur, file_hash, STAGE_WRITTEN, statement_id)
+
+                return {"ref_id": ref_id, "statement_id": statement_id, "file_hash": file_hash, "file_refs": file_refs}
+
+            except Exception as e:
+                log.error(f"[write_all_statements] failed on index {i} (ref {ref_id}): {e}")
+                return {"ref_id": ref_id, "err_details": str(e)}
+
+        outcomes = await asyncio.gather(*[write_one(i, ref_id) for i, ref_id in enumerate(parsed_refs)])
+
+        written = [{"ref_id": o["ref_id"], "statement_id": o["statement_id"]} for o in outcomes if "statement_id" in o]
+        failed = [{"ref_id": o["ref_id"], "err_details": o["err_details"]} for o in outcomes if "err_details" in o]
+
+        succeeded = [o for o in outcomes if "statement_id" in o and o["file_refs"] > 1]
+        complete = set(completed_files(succeeded))
+        split_files = {o["file_hash"]: o["statement_id"] for o in succeeded if o["file_hash"] in complete}
+        if split_files:
+            try:
+                async with pool.connection() as conn:
+                    async with conn.cursor() as cur:
+                        for file_hash, statement_id in split_files.items():
+                            await record_stage(cur, file_hash, STAGE_WRITTEN, statement_id)
+                    await conn.commit()
+            except Exception as e:
+                log.warning(f"[write_all_statements] failed to update ingest manifest: {e}")
 
-                        await _write_statement(json_str, conn, cur)
+        log.info(f"[write_all_statements] wrote {len(written)}/{len(parsed_refs)}, {len(failed)} failed")
 
-                    except Exception as e:
-                        log.error(f"[write_all_statements] failed on index {i} (ref {ref_id}): {e}")
-                        await conn.rollback()
-                        return {
-                            "fatal_err": True,
-                            "err_details": str(e)
-                        }
+        if failed and not written:
+            return {"fatal_err": True, "err_details": failed[0]["err_details"], "failed": failed}
 
-                await conn.commit()
-                return {"fatal_err": False}
+        return {"written": written, "failed": failed, "fatal_err": False}
 
     except Exception as e:
         log.error(f"[write_all_statements] unknown failure: {e}")
         return {
             "fatal_err": True,
             "err_details": str(e)
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,120 @@
+from decimal import Decimal
+from typing import AsyncIterator, Optional
+from psycopg.rows import dict_row
+from dependencies import get_db_pool
+from logger import log
+
+def _to_float(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+def transactions_query(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    classifier_version: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> tuple[str, list]:
+    """
+    Builds the SELECT used to read transactions.
+
+    Args:
+        start_date, end_date: Optional ISO dates; both are needed to filter
+        classifier_version: if set, only transactions that are unclassified or
+            were classified by a different version
+        after_id: if set, only transactions with a larger id, ordered by id,
+            so the table can be paged by keyset
+        limit: maximum number of rows
+
+    Returns:
+        tuple: (sql, params)
+    """
+
+    sql = """
+        SELECT 
+            id as transaction_id,
+            transaction_date,
+            transaction_details,
+            amount,
+            category,
+            statement_id,
+            created_at
+        FROM transactions
+    """
+    conditions = []
+    params = []
+    if start_date and end_date:
+        conditions.append("transaction_date BETWEEN %s AND %s")
+        params += [start_date, end_date]
+
+    if classifier_version is not None:
+        conditions.append("(category IS NULL OR classifier_version IS DISTINCT FROM %s)")
+        params.append(classifier_version)
+
+    if after_id is not None:
+        conditions.append("id > %s")
+        params.append(after_id)
+
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+
+    sql += " ORDER BY id ASC" if after_id is not None else " ORDER BY transaction_date ASC, id ASC"
+
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    return sql, params
+
+def to_transaction(row: dict) -> dict:
+    """
+    Converts a transactions_query() row into the dict shape the tools exchange.
+    """
+
+    return {
+        "transaction_id": row["transaction_id"],
+        "transaction_date": row["transaction_date"].isoformat() if row["transaction_date"] else None,
+        "description": row["transaction_details"],
+        "amount": _to_float(row["amount"]),
+        "category": row.get("category"),
+        "statement_id": row["statement_id"],
+        "created_at": row["created_at"].isoformat() if row["created_at"] else None
+    }
+
+async def iter_transaction_chunks(
+    chunk_size: int,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    classifier_version: Optional[str] = None,
+) -> AsyncIterator[list[dict]]:
+    """
+    Pages through transactions in id order, yielding lists of at most
+    chunk_size transactions, so memory is bounded by the chunk size rather
+    than the size of the table. Each page is a keyset query (id > last id) on
+    its own short-lived pool connection, so a slow consumer never holds a
+    connection idle in transaction or an old snapshot. Rows changed while
+    paging are neither skipped nor repeated, since the key is the id.
+    """
+
+    pool = get_db_pool()
+    last_id = 0
+    total = 0
+
+    while True:
+        sql, params = transactions_query(start_date, end_date, classifier_version, after_id=last_id, limit=chunk_size)
+
+        async with pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(sql, params)
+                rows = await cur.fetchall()
+
+        if not rows:
+            break
+
+        last_id = rows[-1]["transaction_id"]
+        total += len(rows)
+        yield [to_transaction(row) for row in rows]
+
+        if len(rows) < chunk_size:
+            break
+
+    log.info(f"[transaction_reader] streamed {total} transactions")
@@ -0,0 +1,117 @@
+import asyncio
+from functools import lru_cache
+from dependencies import get_db_pool, get_search_client
+from config import get_settings
+from logger import log
+
+class WebContextCache:
+    """
+    Web search context for transaction classification, cached per normalised
+    merchant in Postgres with a TTL. Concurrent requests for the same merchant
+    share one search, and at most WEB_CONTEXT_MAX_CONCURRENCY searches run at once.
+    """
+
+    def __init__(self, ttl_days: int, max_concurrency: int):
+        self.ttl_days = ttl_days
+        self.max_concurrency = max_concurrency
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._semaphore: asyncio.Semaphore | None = None
+
+    async def get_contexts(self, queries: dict[str, str]) -> dict[str, str]:
+        """
+        Returns web context for each merchant key, searching only for keys
+        that aren't cached or have expired.
+
+        Args:
+            queries: {merchant_key: search query (e.g. a raw transaction description)}
+
+        Returns:
+            dict: {merchant_key: context text ("" if the search failed)}
+        """
+
+        if not queries:
+            return {}
+
+        contexts = await self._load(list(queries))
+        misses = [key for key in queries if key not in contexts]
+
+        if misses:
+            log.info(f"[web_context] {len(contexts)} cached, {len(misses)} to search")
+            fetched = await asyncio.gather(*[self._search_once(key, queries[key]) for key in misses])
+            contexts.update(zip(misses, fetched))
+
+        return contexts
+
+    async def _search_once(self, key: str, query: str) -> str:
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        try:
+            context = await self._search(query)
+            if context:
+                try:
+                    await self._store(key, context)
+                except Exception as e:
+                    log.warning(f"[web_context] failed to cache context for '{key}': {e}")
+
+            future.set_result(context)
+            return context
+        finally:
+            if not future.done():
+                future.cancel()
+            self._inflight.pop(key, None)
+
+    async def _search(self, query: str) -> str:
+        """
+        Runs one search under the concurrency cap. Returns "" on failure.
+        """
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            try:
+                results = await get_search_client().ainvoke({"query": query})
+            except Exception as e:
+                log.warning(f"[web_context] search failed for '{query}': {e}")
+                return ""
+
+        return "\n".join(f"- {r.get('title', '')}: {r.get('content', '')}" for r in results.get("results", []))
+
+    async def _load(self, keys: list[str]) -> dict[str, str]:
+        pool = get_db_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT merchant_key, context
+                    FROM merchant_web_context
+                    WHERE merchant_key = ANY(%s)
+                        AND fetched_at > CURRENT_TIMESTAMP - make_interval(days => %s);
+                """, (keys, self.ttl_days))
+                rows = await cur.fetchall()
+
+        return {row[0]: row[1] for row in rows}
+
+    async def _store(self, key: str, context: str) -> None:
+        pool = get_db_pool()
+        async with pool.connection() as conn:
+            await conn.execute("""
+                INSERT INTO merchant_web_context (merchant_key, context)
+                VALUES (%s, %s)
+                ON CONFLICT (merchant_key) DO UPDATE SET
+                    context = EXCLUDED.context,
+                    fetched_at = CURRENT_TIMESTAMP;
+            """, (key, context))
+            await conn.commit()
+
+@lru_cache(maxsize=1)
+def get_web_context_cache() -> WebContextCache:
+    s = get_settings()
+
+    return WebContextCache(
+        ttl_days=s.WEB_CONTEXT_TTL_DAYS,
+        max_concurrency=s.WEB_CONTEXT_MAX_CONCURRENCY,
+    )